@@ -0,0 +1,27 @@
+# gunicorn_config.py - Production server settings for the logo generator backend
+#
+# Usage: gunicorn -c gunicorn_config.py main:app
+#
+# Each worker is a separate process with its own event loop, so the shared HTTP
+# client, access-token cache and Imagen batcher are created per worker in the
+# FastAPI startup event. VERTEX_MAX_CONCURRENCY is per worker too: N workers allow
+# up to N times that many concurrent Vertex AI calls. Rate-limit windows are also
+# per worker unless REDIS_URL is set: without it, N workers let a client get up to
+# N times RATE_LIMIT_RPM/IPM.
+import os
+
+# UvicornWorker picks uvloop and httptools automatically (installed by uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", (2 * (os.cpu_count() or 1)) + 1))
+# Workers inherit this, so each takes its share of the project-wide VERTEX_QPM
+os.environ["WEB_CONCURRENCY"] = str(workers)
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Vertex AI generations can take up to a minute
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1,35 +1,64 @@
 # main.py - Enhanced Google Vertex AI Imagen Logo Generator Backend
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-import json
+from starlette.datastructures import Headers
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import List, Optional, Dict, Any, Literal, Deque, Tuple, Annotated
+import re
 import hashlib
+import secrets
+import shutil
+import stat
+import functools
+import operator
+import gzip
 import time
 import asyncio
-from datetime import datetime
-import requests
+import concurrent.futures
+from types import MappingProxyType
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+import httpx
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 import base64
 from io import BytesIO
 from PIL import Image
 import os
 from dotenv import load_dotenv
 import logging
+import logging.handlers
+import queue
+import atexit
 from google.auth import default
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import Request as GoogleAuthRequest
 import google.auth
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (set LOG_LEVEL=WARNING in production to mute per-request records).
+# Loggers only enqueue records; a listener thread formats them and does the stderr writes,
+# so log I/O never blocks the event loop.
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_enqueue = logging.handlers.QueueHandler(_log_queue)
+_log_enqueue.setFormatter(logging.Formatter("%(message)s"))
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[_log_enqueue])
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+# Flushes whatever is still queued when the process exits
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # ================== CONFIGURATION ==================
 app = FastAPI(
     title="Vertex AI Imagen Logo Generator - Enhanced Version",
     description="Professional logo generation using Google's Vertex AI Imagen with business context integration",
-    version="8.1.0-enhanced"
+    version="8.1.0-enhanced",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -41,9 +70,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip API responses; logo images are already compressed and pass straight through"""
+    
+    UNCOMPRESSED_PATHS = ("/static/logos/", "/api/v1/logo/")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.UNCOMPRESSED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress multi-KB JSON (setup guide, diagnostics, generation results)
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Load environment variables
 load_dotenv()
 
+def _now_iso() -> str:
+    """Current UTC time for response timestamps (second precision)"""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
 # Get Google Cloud Configuration
 GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -52,101 +99,473 @@ GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 CREDENTIALS = None
 PROJECT_ID = None
 
+# Cached OAuth2 access token (refreshed under a single lock to avoid stampedes)
+_TOKEN_CACHE = {"token": None, "expiry": 0.0}
+_TOKEN_LOCK = asyncio.Lock()
+
 def initialize_google_auth():
     global CREDENTIALS, PROJECT_ID
     try:
         if GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(GOOGLE_APPLICATION_CREDENTIALS):
             # Use service account file
             CREDENTIALS, PROJECT_ID = default()
-            logger.info(f"✅ Using service account credentials: {GOOGLE_APPLICATION_CREDENTIALS}")
+            logger.info("✅ Using service account credentials: %s", GOOGLE_APPLICATION_CREDENTIALS)
         elif GOOGLE_CLOUD_PROJECT:
             # Use default credentials with explicit project
             CREDENTIALS, _ = default()
             PROJECT_ID = GOOGLE_CLOUD_PROJECT
-            logger.info(f"✅ Using default credentials with project: {PROJECT_ID}")
+            logger.info("✅ Using default credentials with project: %s", PROJECT_ID)
         else:
             # Try default credentials
             CREDENTIALS, PROJECT_ID = default()
-            logger.info(f"✅ Using default credentials, detected project: {PROJECT_ID}")
+            logger.info("✅ Using default credentials, detected project: %s", PROJECT_ID)
         
         # Refresh credentials
         if CREDENTIALS.expired:
-            CREDENTIALS.refresh(Request())
+            CREDENTIALS.refresh(GoogleAuthRequest())
+        
+        # New credentials invalidate any cached token
+        _TOKEN_CACHE.update(token=None, expiry=0.0)
             
         return True
     except Exception as e:
-        logger.error(f"❌ Failed to initialize Google credentials: {str(e)}")
+        logger.error("❌ Failed to initialize Google credentials: %s", e)
         return False
 
+# Word tokenizer for keyword matching (keeps hyphenated words like "high-end" whole)
+_WORD_RE = re.compile(r"[a-z]+(?:-[a-z]+)*")
+
 # Rate limiting
-rate_limits = {}
+class TokenBucket:
+    """Token bucket - absorbs bursts up to `capacity`, refills at `refill_rate` tokens/sec"""
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.refill_rate = refill_rate
+        self.last_refill = time.monotonic()
+    
+    def limit(self, cost: float = 1) -> Optional[float]:
+        """Take `cost` tokens if available.
+        
+        Returns None on success, otherwise the seconds until `cost` tokens will be
+        available (nothing is consumed in that case).
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+        
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return None
+        return (cost - self.tokens) / self.refill_rate
+
+class AsyncTokenBucket(TokenBucket):
+    """Token bucket that waits for tokens instead of rejecting the caller"""
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        super().__init__(capacity, refill_rate)
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, cost: float = 1):
+        """Take `cost` tokens, sleeping until they are available (waiters are served FIFO)"""
+        async with self._lock:
+            wait_time = self.limit(cost)
+            while wait_time is not None:
+                await asyncio.sleep(wait_time)
+                wait_time = self.limit(cost)
+
+class SlidingWindowLimiter:
+    """Strict rolling-window cap on both requests and images per client"""
+    
+    def __init__(self, window: float, max_requests: int, max_images: int):
+        self.window = window
+        self.max_requests = max_requests
+        self.max_images = max_images
+        self._hits: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._images: Dict[str, int] = {}
+    
+    def hit(self, client_id: str, images: int = 1) -> Optional[float]:
+        """Record a request for `images` images.
+        
+        Both limits are checked before anything is recorded, so a rejected request
+        never counts against the client. Returns None when admitted, otherwise the
+        seconds until the request would fit in the window.
+        """
+        now = time.monotonic()
+        hits = self._hits.get(client_id)
+        if hits is None:
+            hits = self._hits[client_id] = deque()
+            self._images[client_id] = 0
+        
+        cutoff = now - self.window
+        while hits and hits[0][0] <= cutoff:
+            self._images[client_id] -= hits.popleft()[1]
+        
+        if len(hits) >= self.max_requests or self._images[client_id] + images > self.max_images:
+            if images > self.max_images:
+                return self.window
+            # Expire the oldest hits until this request would fit
+            count, total = len(hits), self._images[client_id]
+            for timestamp, hit_images in hits:
+                count -= 1
+                total -= hit_images
+                if count < self.max_requests and total + images <= self.max_images:
+                    return timestamp + self.window - now
+        
+        hits.append((now, images))
+        self._images[client_id] += images
+        return None
+    
+    def evict_idle(self) -> int:
+        """Forget clients whose newest hit has left the window; returns how many were dropped"""
+        cutoff = time.monotonic() - self.window
+        idle = [client_id for client_id, hits in self._hits.items() if not hits or hits[-1][0] <= cutoff]
+        for client_id in idle:
+            del self._hits[client_id]
+            del self._images[client_id]
+        return len(idle)
+
+class RedisSlidingWindowLimiter:
+    """SlidingWindowLimiter with its state in Redis, so all workers and replicas share one quota per client
+    
+    Each client is a sorted set of "<nonce>:<images>" members scored by hit time in ms. The check
+    and the insert run as one Lua script, so concurrent requests can't both slip under the limit,
+    and the script reads Redis' own clock so workers with skewed clocks still agree.
+    """
+    
+    _HIT_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local window = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local max_images = tonumber(ARGV[3])
+local images = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local hits = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+local count = #hits / 2
+local total = 0
+for i = 1, #hits, 2 do
+    total = total + tonumber(string.match(hits[i], ':(%d+)$'))
+end
+
+if count >= max_requests or total + images > max_images then
+    if images > max_images then
+        return window
+    end
+    for i = 1, #hits, 2 do
+        count = count - 1
+        total = total - tonumber(string.match(hits[i], ':(%d+)$'))
+        if count < max_requests and total + images <= max_images then
+            return tonumber(hits[i + 1]) + window - now
+        end
+    end
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[5] .. ':' .. images)
+redis.call('PEXPIRE', KEYS[1], window)
+return -1
+"""
+    
+    def __init__(self, client: aioredis.Redis, window: float, max_requests: int, max_images: int, prefix: str = "rl:"):
+        self.window = window
+        self.max_requests = max_requests
+        self.max_images = max_images
+        self.prefix = prefix
+        self._hit = client.register_script(self._HIT_SCRIPT)
+    
+    async def hit(self, client_id: str, images: int = 1) -> Optional[float]:
+        """Same contract as SlidingWindowLimiter.hit; raises RedisError if Redis is unreachable"""
+        wait_ms = await self._hit(
+            keys=[self.prefix + client_id],
+            args=[int(self.window * 1000), self.max_requests, self.max_images, images, secrets.token_hex(8)]
+        )
+        return None if wait_ms < 0 else wait_ms / 1000
+
+# Per-client limits over a rolling window - generations call paid Vertex AI, so no bursts
+RATE_LIMIT_WINDOW = float(os.getenv("RATE_LIMIT_WINDOW", "60"))
+RATE_LIMIT_RPM = int(os.getenv("RATE_LIMIT_RPM", "2"))
+RATE_LIMIT_IPM = int(os.getenv("RATE_LIMIT_IPM", "4"))
+rate_limits = SlidingWindowLimiter(RATE_LIMIT_WINDOW, RATE_LIMIT_RPM, RATE_LIMIT_IPM)
+# When set, the limits above are enforced in Redis across all workers; the per-worker limiter
+# only takes over while Redis is unreachable
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+# Callers sending one of these keys in X-API-Key get their own quota; unknown keys are ignored
+# so they can't be rotated to dodge the limit
+API_KEYS = frozenset(key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip())
+# Set when running behind our own proxy (see nginx.conf), which appends the peer to X-Forwarded-For
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+
+# Bucket protecting the upstream Vertex AI per-project quota. Each worker process has its own,
+# so it gets an equal share of VERTEX_QPM (gunicorn_config.py exports WEB_CONCURRENCY)
+VERTEX_QPM = float(os.getenv("VERTEX_QPM", "60"))
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+VERTEX_WORKER_QPM = VERTEX_QPM / WORKER_COUNT
+VERTEX_RATE_LIMITER = AsyncTokenBucket(capacity=max(1.0, VERTEX_WORKER_QPM / 10), refill_rate=VERTEX_WORKER_QPM / 60)
+
+def client_identity(request: Request) -> str:
+    """Rate-limit key for a caller: API key, then forwarded client IP, then peer IP"""
+    api_key = request.headers.get("x-api-key")
+    if api_key in API_KEYS:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    
+    if TRUST_FORWARDED_FOR:
+        # Only the last entry was written by our proxy; anything before it is client-supplied
+        forwarded = request.headers.get("x-forwarded-for", "").rsplit(",", 1)[-1].strip()
+        if forwarded:
+            return "ip:" + forwarded
+    
+    return "ip:" + (request.client.host if request.client else "anonymous")
+
+async def evict_idle_rate_limits():
+    """Background task - drop idle clients so the limiter's memory stays bounded"""
+    while True:
+        await asyncio.sleep(RATE_LIMIT_WINDOW)
+        evicted = rate_limits.evict_idle()
+        if evicted:
+            logger.debug("🧹 Evicted %s idle rate-limit entries", evicted)
+
+async def enforce_client_rate_limit(request: Request, images: int):
+    """Rate limit logo generation per client, counting both requests and images"""
+    client_id = client_identity(request)
+    
+    shared_limits = getattr(request.app.state, "redis_rate_limits", None)
+    if shared_limits is not None:
+        try:
+            wait_time = await shared_limits.hit(client_id, images)
+        except RedisError as e:
+            logger.warning("⚠️ Redis rate limiter unavailable, using per-worker limits: %s", e)
+            wait_time = rate_limits.hit(client_id, images)
+    else:
+        wait_time = rate_limits.hit(client_id, images)
+    if wait_time is not None:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded, please wait {wait_time:.0f} seconds before generating more logos",
+            headers={"Retry-After": str(int(wait_time) + 1)}
+        )
+
+# Cap on concurrent in-flight Vertex AI predict calls per worker (so WEB_CONCURRENCY times this in total)
+VERTEX_MAX_CONCURRENCY = int(os.getenv("VERTEX_MAX_CONCURRENCY", "4"))
+VERTEX_SEMAPHORE = asyncio.Semaphore(VERTEX_MAX_CONCURRENCY)
+
+# Transient Vertex AI failures (dropped connections, quota 429s, 5xx) are retried with
+# exponential backoff. Timeouts are not retried - the generation may still be billed.
+VERTEX_MAX_RETRIES = int(os.getenv("VERTEX_MAX_RETRIES", "2"))
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+# Private server state; kept out of generated_logos/, which is served publicly
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Content-addressed cache of generated images, keyed by model + prompt. Private too: cache keys
+# can be rebuilt from a prompt, so serving them would bypass rate limits and expose other users' logos.
+LOGO_CACHE_ENABLED = os.getenv("LOGO_CACHE_ENABLED", "1") == "1"
+LOGO_CACHE_DIR = os.path.join(DATA_DIR, "logo_cache")
+# Seconds before a cached image is regenerated (0 keeps entries forever)
+LOGO_CACHE_TTL = float(os.getenv("LOGO_CACHE_TTL", "0"))
 
 # Create directories
 os.makedirs("generated_logos", exist_ok=True)
 os.makedirs("static", exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+os.makedirs(LOGO_CACHE_DIR, exist_ok=True)
+
+def _link_or_copy(src: str, dst: str):
+    """Hardlink src to dst, falling back to a copy where links are unsupported
+    
+    The copy (e.g. DATA_DIR and generated_logos on different volumes) goes through a temp
+    file and a rename, so a half-written logo is never served.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        tmp_path = f"{dst}.{secrets.token_hex(4)}.tmp"
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+
+def logo_file_path(logo_id: str, file_extension: str) -> str:
+    """Where a logo's file lives: every file is named by its exact logo id, so any worker
+    resolves a download without an index or probing, and a miss is a 404 rather than a guess
+    """
+    return os.path.join("generated_logos", f"{logo_id}.{file_extension}")
 
-# Mount static files
-app.mount("/static/logos", StaticFiles(directory="generated_logos"), name="logos")
+def _write_webp_variant(png_path: str) -> str:
+    """Blocking: encode a WebP copy next to a PNG logo and return its path
+    
+    Only done on the first WebP download of a logo, so generation never pays for it.
+    """
+    webp_path = os.path.splitext(png_path)[0] + ".webp"
+    if os.path.exists(webp_path):
+        return webp_path
+    tmp_path = f"{webp_path}.{secrets.token_hex(4)}.tmp"
+    with Image.open(png_path) as im:
+        im.save(tmp_path, "WEBP", quality=90, method=4)
+    os.replace(tmp_path, webp_path)
+    return webp_path
+
+# Content-hash ETag and stat of served logos, memoized per path (logo files never change once
+# written). LRU-bounded so a long-running worker doesn't keep an entry for every logo ever served.
+LOGO_FILE_META_MAX = 4096
+LOGO_FILE_META: OrderedDict[str, Tuple[str, os.stat_result]] = OrderedDict()
+LOGO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _logo_file_meta(file_path: str) -> Optional[Tuple[str, os.stat_result]]:
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return f'"sha256-{digest.hexdigest()[:16]}"', stat_result
+
+async def logo_file_meta(file_path: str) -> Optional[Tuple[str, os.stat_result]]:
+    """Memoized _logo_file_meta; misses run in the thread pool and aren't remembered"""
+    meta = LOGO_FILE_META.get(file_path)
+    if meta is not None:
+        LOGO_FILE_META.move_to_end(file_path)
+        return meta
+    meta = await asyncio.to_thread(_logo_file_meta, file_path)
+    if meta is not None:
+        LOGO_FILE_META[file_path] = meta
+        if len(LOGO_FILE_META) > LOGO_FILE_META_MAX:
+            LOGO_FILE_META.popitem(last=False)
+    return meta
+
+class LogoStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching + strong content-hash ETags for PNG logos
+    
+    Only requests under the mount pay for this; the rest of the app sees no extra middleware.
+    """
+    
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code not in (200, 304) or not path.endswith(".png"):
+            return response
+        
+        # StaticFiles has already resolved and checked the path, so it's inside the directory
+        meta = await logo_file_meta(os.path.join("generated_logos", path))
+        if meta is None:
+            return response
+        
+        headers = {"Cache-Control": LOGO_CACHE_CONTROL, "ETag": meta[0]}
+        if Headers(scope=scope).get("if-none-match") == meta[0]:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return response
+
+# Mount static files (disable with SERVE_STATIC_LOGOS=0 when a reverse proxy serves
+# /static/logos/ straight from disk with sendfile - see nginx.conf)
+SERVE_STATIC_LOGOS = os.getenv("SERVE_STATIC_LOGOS", "1") == "1"
+if SERVE_STATIC_LOGOS:
+    app.mount("/static/logos", LogoStaticFiles(directory="generated_logos"), name="logos")
 
 # ================== DATA MODELS ==================
+StyleType = Literal["modern", "vintage", "bold", "elegant", "playful", "professional"]
+ImagenModel = Literal["imagegeneration@006", "imagegeneration@005"]
+# "#RRGGBB", "#RGB" or either without the "#" - the forms nearest_color_name understands.
+# pydantic-core compiles the pattern once when the model is built.
+HexColor = Annotated[str, StringConstraints(pattern=r"^#?(?:[0-9A-Fa-f]{3}){1,2}$")]
+
 class BusinessInfo(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+    
     name: str = Field(..., min_length=1, max_length=50)
     industry: str = Field(..., min_length=1)
     description: Optional[str] = Field(None, max_length=200)
     target_audience: Optional[str] = Field(None, max_length=100)
 
 class LogoStyle(BaseModel):
-    style_type: str = Field(..., pattern="^(modern|vintage|bold|elegant|playful|professional)$")
-    color_palette: List[str] = Field(..., min_items=1, max_items=3)
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+    
+    style_type: StyleType
+    color_palette: list[HexColor] = Field(..., min_length=1, max_length=3)
     font_preference: Optional[str] = "sans-serif"
 
 class LogoGenerationRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
     business_info: BusinessInfo
     style: LogoStyle
     variations: Optional[int] = Field(1, ge=1, le=2)
-    imagen_model: Optional[str] = Field("imagegeneration@006", pattern="^(imagegeneration@006|imagegeneration@005)$")
+    imagen_model: Optional[ImagenModel] = "imagegeneration@006"
 
 class LogoResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
     id: str
     name: str
     image_url: str
     local_path: Optional[str] = None
-    style_info: Dict[str, Any]
-    colors_used: List[str]
+    style_info: dict[str, Any]
+    colors_used: list[str]
     generation_time: float
     confidence_score: float
     prompt_used: str
+    # Served from the prompt cache rather than generated (and billed) for this request
+    cached: bool = False
 
 class GenerationStats(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
     total_time: float
     logos_generated: int
     ai_model: str
     quality: str
     approximate_cost: str
     real_ai_generated: bool
+    cache_hits: int = 0
 
 # ================== ENHANCED VERTEX AI IMAGEN GENERATOR ==================
 
+def _build_color_lut(palette: List[str]) -> bytes:
+    """Map every cell of a 32x32x32 quantized RGB grid to the index of its nearest palette color"""
+    rgb = [(int(c[1:3], 16), int(c[3:5], 16), int(c[5:7], 16)) for c in palette]
+    indices = range(len(rgb))
+    # Squared distance is separable per channel: precompute each axis, then sum rows with map()
+    # so the per-cell argmin runs in C (ties still go to the earlier palette entry)
+    axis = [[[((v << 3) + 4 - color[channel]) ** 2 for color in rgb] for v in range(32)] for channel in range(3)]
+    lut = bytearray(32 * 32 * 32)
+    for r5 in range(32):
+        dr = axis[0][r5]
+        for g5 in range(32):
+            drg = list(map(operator.add, dr, axis[1][g5]))
+            base = (r5 << 10) | (g5 << 5)
+            for b5 in range(32):
+                lut[base | b5] = min(zip(map(operator.add, drg, axis[2][b5]), indices))[1]
+    return bytes(lut)
+
 class VertexImagenLogoGenerator:
     """Generate professional logos using Google Vertex AI Imagen with enhanced business context"""
     
-    # Updated model configuration for Vertex AI
-    VERTEX_MODELS = {
-        "imagegeneration@006": {
+    # Updated model configuration for Vertex AI (read-only - shared by every request)
+    VERTEX_MODELS = MappingProxyType({
+        "imagegeneration@006": MappingProxyType({
             "base_url": "https://{location}-aiplatform.googleapis.com/v1/projects/{project}/locations/{location}/publishers/google/models/imagegeneration@006:predict",
             "cost": 0.03,
             "description": "Latest Imagen model with improved quality"
-        },
-        "imagegeneration@005": {
+        }),
+        "imagegeneration@005": MappingProxyType({
             "base_url": "https://{location}-aiplatform.googleapis.com/v1/projects/{project}/locations/{location}/publishers/google/models/imagegeneration@005:predict",
             "cost": 0.025,
             "description": "Previous generation Imagen model"
-        }
-    }
+        })
+    })
+    DEFAULT_MODEL_CONFIG = VERTEX_MODELS["imagegeneration@006"]
     
     # Default location for Vertex AI
     DEFAULT_LOCATION = "us-central1"
     
+    # Models seen rejecting multi-instance requests (per worker, learned at runtime);
+    # their prompts are sent one per request without waiting to be batched
+    SINGLE_INSTANCE_MODELS: set = set()
+    
     # Enhanced logo prompts optimized for Vertex AI Imagen
     IMAGEN_LOGO_PROMPTS = {
         'modern': [
@@ -178,25 +597,164 @@ class VertexImagenLogoGenerator:
         '#6B7280': 'gray', '#374151': 'dark gray',
         '#EC4899': 'pink', '#BE185D': 'deep pink',
         '#14B8A6': 'teal', '#0D9488': 'dark teal',
-        '#000000': 'black', '#FFFFFF': 'white'
+        '#000000': 'black', '#FFFFFF': 'white',
+        # Wider named palette so arbitrary picker colors snap to a close, descriptive name
+        '#EAB308': 'yellow', '#D4AF37': 'gold',
+        '#92400E': 'brown', '#D2B48C': 'tan',
+        '#F5F5DC': 'beige', '#FFFDD0': 'cream',
+        '#800000': 'maroon', '#800020': 'burgundy',
+        '#DC143C': 'crimson', '#F43F5E': 'rose',
+        '#FF7F50': 'coral', '#FFDAB9': 'peach',
+        '#808000': 'olive green', '#84CC16': 'lime green',
+        '#228B22': 'forest green', '#98FF98': 'mint green',
+        '#06B6D4': 'cyan', '#40E0D0': 'turquoise',
+        '#0EA5E9': 'sky blue', '#4169E1': 'royal blue',
+        '#4F46E5': 'indigo', '#D946EF': 'magenta',
+        '#C4B5FD': 'lavender', '#C0C0C0': 'silver',
+        '#36454F': 'charcoal'
     }
     
+    # Nearest-name lookup for arbitrary hex colors (built once at import)
+    PALETTE_NAMES = tuple(COLOR_NAMES.values())
+    COLOR_LUT = _build_color_lut(list(COLOR_NAMES))
+    
+    # Description keywords -> context element (first match wins)
+    DESC_KEYWORD_MAP = (
+        (frozenset({'tech', 'technology', 'software', 'digital', 'app', 'apps', 'platform', 'platforms', 'system', 'systems'}),
+         "incorporating subtle tech-inspired elements"),
+        (frozenset({'food', 'restaurant', 'restaurants', 'cafe', 'kitchen', 'dining'}),
+         "with food-related symbolic elements"),
+        (frozenset({'health', 'healthcare', 'medical', 'wellness', 'fitness', 'care'}),
+         "featuring health and wellness symbolism"),
+        (frozenset({'finance', 'money', 'investment', 'investments', 'banking', 'financial'}),
+         "with financial stability and trust symbols"),
+        (frozenset({'education', 'school', 'schools', 'learning', 'teaching', 'training'}),
+         "incorporating educational and growth elements"),
+        (frozenset({'creative', 'design', 'art', 'artistic', 'studio'}),
+         "with creative and artistic flair"),
+        (frozenset({'service', 'services', 'consulting', 'professional', 'expert', 'experts'}),
+         "emphasizing professionalism and expertise"),
+        (frozenset({'eco', 'eco-friendly', 'green', 'sustainable', 'environment', 'natural'}),
+         "with eco-friendly and natural elements"),
+        (frozenset({'luxury', 'premium', 'high-end', 'exclusive'}),
+         "with luxury and premium aesthetics"),
+        (frozenset({'fun', 'entertainment', 'game', 'games', 'play', 'joy'}),
+         "with playful and entertaining elements"),
+    )
+    
+    # Industry substring -> (skip if context already contains, context element); first applicable wins
+    INDUSTRY_CONTEXT_MAP = (
+        ('technology', 'tech-inspired', "with modern technology aesthetics"),
+        ('healthcare', 'health', "conveying trust and care"),
+        ('finance', 'financial', "symbolizing stability and growth"),
+        ('retail', None, "appealing to consumers with inviting design"),
+        ('education', 'educational', "inspiring learning and development"),
+        ('real estate', None, "representing stability and home"),
+        ('consulting', 'professional', "projecting expertise and reliability"),
+        ('food', 'food-related', "with appetizing and welcoming elements"),
+        ('creative', 'creative', "showcasing creativity and innovation"),
+        ('manufacturing', None, "representing quality and precision"),
+    )
+    
+    # Industry words -> the INDUSTRY_CONTEXT_MAP keyword they mean, for API callers that
+    # don't use the frontend's fixed industry list
+    INDUSTRY_ALIASES = MappingProxyType({
+        'tech': 'technology', 'software': 'technology', 'saas': 'technology',
+        'health': 'healthcare', 'medical': 'healthcare', 'wellness': 'healthcare', 'dental': 'healthcare',
+        'banking': 'finance', 'fintech': 'finance', 'insurance': 'finance', 'accounting': 'finance',
+        'ecommerce': 'retail', 'e-commerce': 'retail', 'shop': 'retail', 'store': 'retail',
+        'school': 'education', 'tutoring': 'education', 'training': 'education',
+        'property': 'real estate', 'realty': 'real estate',
+        'restaurant': 'food', 'cafe': 'food', 'bakery': 'food', 'catering': 'food', 'beverage': 'food',
+        'design': 'creative', 'agency': 'creative', 'marketing': 'creative', 'media': 'creative',
+        'industrial': 'manufacturing', 'factory': 'manufacturing',
+    })
+    
+    # Target audience keywords -> context element (first match wins)
+    AUDIENCE_KEYWORD_MAP = (
+        (frozenset({'young', 'millennial', 'millennials', 'gen', 'genz', 'gen-z', 'youth'}),
+         "with contemporary appeal for younger demographics"),
+        (frozenset({'professional', 'professionals', 'business', 'businesses', 'corporate'}),
+         "tailored for professional audiences"),
+        (frozenset({'family', 'families', 'parent', 'parents', 'children', 'kids'}),
+         "family-friendly and approachable"),
+        (frozenset({'luxury', 'affluent', 'premium', 'high-income'}),
+         "designed for discerning, upscale clientele"),
+    )
+    
+    # Variation approaches (rotated through for multiple variations)
+    VARIATION_APPROACHES = (
+        "",  # Original version
+        "with subtle gradients and modern typography",
+        "featuring clean geometric shapes and professional styling",
+        "incorporating elegant design elements and premium finish",
+        "with contemporary aesthetics and refined details",
+        "emphasizing brand recognition and memorability",
+        "with balanced composition and visual hierarchy",
+        "featuring distinctive character and market appeal"
+    )
+    
     @staticmethod
-    def get_access_token() -> str:
-        """Get access token for Vertex AI API"""
-        global CREDENTIALS
+    def nearest_color_name(color: str, default: str = 'blue') -> str:
+        """Name a hex color, snapping to the nearest palette entry when it isn't an exact match"""
+        hex_color = color.strip().upper()
+        if not hex_color.startswith('#'):
+            hex_color = f"#{hex_color}"
+        
+        name = VertexImagenLogoGenerator.COLOR_NAMES.get(hex_color)
+        if name:
+            return name
+        
+        if len(hex_color) == 4:  # #RGB shorthand
+            hex_color = "#" + "".join(ch * 2 for ch in hex_color[1:])
+        if len(hex_color) != 7:
+            return default
+        try:
+            r, g, b = int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)
+        except ValueError:
+            return default
+        
+        idx = VertexImagenLogoGenerator.COLOR_LUT[((r >> 3) << 10) | ((g >> 3) << 5) | (b >> 3)]
+        return VertexImagenLogoGenerator.PALETTE_NAMES[idx]
+    
+    @staticmethod
+    async def get_access_token() -> str:
+        """Get access token for Vertex AI API (cached until 60s before expiry)"""
         if not CREDENTIALS:
             raise Exception("Credentials not initialized")
         
-        if CREDENTIALS.expired:
-            CREDENTIALS.refresh(Request())
+        if _TOKEN_CACHE["token"] and time.time() < _TOKEN_CACHE["expiry"] - 60:
+            return _TOKEN_CACHE["token"]
         
-        return CREDENTIALS.token
+        async with _TOKEN_LOCK:
+            # Another task may have refreshed while we waited for the lock
+            if _TOKEN_CACHE["token"] and time.time() < _TOKEN_CACHE["expiry"] - 60:
+                return _TOKEN_CACHE["token"]
+            
+            # google-auth reports expiry as a naive UTC datetime
+            expiry = CREDENTIALS.expiry.replace(tzinfo=timezone.utc).timestamp() if CREDENTIALS.expiry else 0.0
+            if not CREDENTIALS.token or time.time() >= expiry - 60:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, CREDENTIALS.refresh, GoogleAuthRequest())
+                expiry = CREDENTIALS.expiry.replace(tzinfo=timezone.utc).timestamp() if CREDENTIALS.expiry else time.time() + 300
+            
+            _TOKEN_CACHE["token"] = CREDENTIALS.token
+            _TOKEN_CACHE["expiry"] = expiry
+            return _TOKEN_CACHE["token"]
     
     @staticmethod
     def create_vertex_prompts(business_name: str, industry: str, style: str, colors: List[str], variations: int = 1, 
                              business_description: Optional[str] = None, target_audience: Optional[str] = None) -> List[str]:
         """Create optimized prompts for Vertex AI Imagen with business context and proper variations"""
+        return list(VertexImagenLogoGenerator._build_vertex_prompts(
+            business_name, industry, style, tuple(colors), variations, business_description, target_audience
+        ))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _build_vertex_prompts(business_name: str, industry: str, style: str, colors: tuple, variations: int,
+                              business_description: Optional[str], target_audience: Optional[str]) -> tuple:
+        """Memoized prompt builder behind create_vertex_prompts (arguments must be hashable)"""
         
         # Sanitize business name
         safe_name = business_name.replace("&", "and").strip()
@@ -204,7 +762,7 @@ class VertexImagenLogoGenerator:
         # Convert colors to natural language
         color_names = []
         for color in colors[:2]:  # Use max 2 colors
-            color_names.append(VertexImagenLogoGenerator.COLOR_NAMES.get(color, 'blue'))
+            color_names.append(VertexImagenLogoGenerator.nearest_color_name(color))
         
         color_text = ' and '.join(color_names) if len(color_names) > 1 else color_names[0] if color_names else "blue"
         
@@ -218,88 +776,49 @@ class VertexImagenLogoGenerator:
         context_elements = []
         
         if business_description and business_description.strip():
-            desc = business_description.strip().lower()
+            desc = " ".join(business_description.split()).lower()
+            desc_tokens = frozenset(_WORD_RE.findall(desc))
             
             # Extract key concepts from description to enhance the logo
-            if any(word in desc for word in ['tech', 'software', 'digital', 'app', 'platform', 'system']):
-                context_elements.append("incorporating subtle tech-inspired elements")
-            elif any(word in desc for word in ['food', 'restaurant', 'cafe', 'kitchen', 'dining']):
-                context_elements.append("with food-related symbolic elements")
-            elif any(word in desc for word in ['health', 'medical', 'wellness', 'fitness', 'care']):
-                context_elements.append("featuring health and wellness symbolism")
-            elif any(word in desc for word in ['finance', 'money', 'investment', 'banking', 'financial']):
-                context_elements.append("with financial stability and trust symbols")
-            elif any(word in desc for word in ['education', 'school', 'learning', 'teaching', 'training']):
-                context_elements.append("incorporating educational and growth elements")
-            elif any(word in desc for word in ['creative', 'design', 'art', 'artistic', 'studio']):
-                context_elements.append("with creative and artistic flair")
-            elif any(word in desc for word in ['service', 'consulting', 'professional', 'expert']):
-                context_elements.append("emphasizing professionalism and expertise")
-            elif any(word in desc for word in ['eco', 'green', 'sustainable', 'environment', 'natural']):
-                context_elements.append("with eco-friendly and natural elements")
-            elif any(word in desc for word in ['luxury', 'premium', 'high-end', 'exclusive']):
-                context_elements.append("with luxury and premium aesthetics")
-            elif any(word in desc for word in ['fun', 'entertainment', 'game', 'play', 'joy']):
-                context_elements.append("with playful and entertaining elements")
+            for keywords, element in VertexImagenLogoGenerator.DESC_KEYWORD_MAP:
+                if desc_tokens & keywords:
+                    context_elements.append(element)
+                    break
             else:
                 # Generic enhancement based on description keywords
                 context_elements.append(f"reflecting the essence of {desc[:50]}...")
         
         # Add industry-specific enhancements
         industry_lower = industry.lower()
-        if 'technology' in industry_lower and 'tech-inspired' not in str(context_elements):
-            context_elements.append("with modern technology aesthetics")
-        elif 'healthcare' in industry_lower and 'health' not in str(context_elements):
-            context_elements.append("conveying trust and care")
-        elif 'finance' in industry_lower and 'financial' not in str(context_elements):
-            context_elements.append("symbolizing stability and growth")
-        elif 'retail' in industry_lower:
-            context_elements.append("appealing to consumers with inviting design")
-        elif 'education' in industry_lower and 'educational' not in str(context_elements):
-            context_elements.append("inspiring learning and development")
-        elif 'real estate' in industry_lower:
-            context_elements.append("representing stability and home")
-        elif 'consulting' in industry_lower and 'professional' not in str(context_elements):
-            context_elements.append("projecting expertise and reliability")
-        elif 'food' in industry_lower and 'food-related' not in str(context_elements):
-            context_elements.append("with appetizing and welcoming elements")
-        elif 'creative' in industry_lower and 'creative' not in str(context_elements):
-            context_elements.append("showcasing creativity and innovation")
-        elif 'manufacturing' in industry_lower:
-            context_elements.append("representing quality and precision")
+        aliases = [VertexImagenLogoGenerator.INDUSTRY_ALIASES[token] for token in _WORD_RE.findall(industry_lower)
+                   if token in VertexImagenLogoGenerator.INDUSTRY_ALIASES]
+        if aliases:
+            industry_lower = " ".join([industry_lower, *aliases])
+        context_text = " ".join(context_elements)
+        for keyword, skip_if_present, element in VertexImagenLogoGenerator.INDUSTRY_CONTEXT_MAP:
+            if keyword in industry_lower and (skip_if_present is None or skip_if_present not in context_text):
+                context_elements.append(element)
+                break
         
         # Add target audience considerations
         if target_audience and target_audience.strip():
-            audience = target_audience.strip().lower()
-            if any(word in audience for word in ['young', 'millennial', 'gen z', 'youth']):
-                context_elements.append("with contemporary appeal for younger demographics")
-            elif any(word in audience for word in ['professional', 'business', 'corporate']):
-                context_elements.append("tailored for professional audiences")
-            elif any(word in audience for word in ['family', 'parent', 'children', 'kids']):
-                context_elements.append("family-friendly and approachable")
-            elif any(word in audience for word in ['luxury', 'affluent', 'premium', 'high-income']):
-                context_elements.append("designed for discerning, upscale clientele")
+            audience_tokens = frozenset(_WORD_RE.findall(target_audience.lower()))
+            for keywords, element in VertexImagenLogoGenerator.AUDIENCE_KEYWORD_MAP:
+                if audience_tokens & keywords:
+                    context_elements.append(element)
+                    break
         
         # Create variations with different approaches
-        variation_approaches = [
-            "",  # Original version
-            "with subtle gradients and modern typography",
-            "featuring clean geometric shapes and professional styling", 
-            "incorporating elegant design elements and premium finish",
-            "with contemporary aesthetics and refined details",
-            "emphasizing brand recognition and memorability",
-            "with balanced composition and visual hierarchy",
-            "featuring distinctive character and market appeal"
-        ]
+        variation_approaches = VertexImagenLogoGenerator.VARIATION_APPROACHES
+        
+        # Base prompt is the same for every variation
+        base_prompt = base_template.format(
+            business_name=safe_name,
+            colors=color_text
+        )
         
         prompts = []
         for i in range(variations):
-            # Start with base prompt
-            base_prompt = base_template.format(
-                business_name=safe_name,
-                colors=color_text
-            )
-            
             # Build the enhanced prompt
             prompt_parts = [base_prompt]
             
@@ -308,54 +827,65 @@ class VertexImagenLogoGenerator:
                 context_to_use = context_elements[i % len(context_elements)]
                 prompt_parts.append(context_to_use)
             
-            # Add variation approach
+            # Add variation approach (the modulo only matters if variations outgrows len(VARIATION_APPROACHES))
             approach = variation_approaches[i % len(variation_approaches)]
             if approach:
                 prompt_parts.append(approach)
             
-            # Combine all parts
-            enhanced_prompt = " ".join(prompt_parts).replace("  ", " ").strip()
+            # Combine all parts (each part is already trimmed and non-empty)
+            enhanced_prompt = " ".join(prompt_parts)
             
-            # Ensure prompt isn't too long (Vertex AI has limits)
+            # Ensure prompt isn't too long (Vertex AI has limits) - 400 chars including the ellipsis
             if len(enhanced_prompt) > 400:
-                enhanced_prompt = enhanced_prompt[:400] + "..."
+                enhanced_prompt = enhanced_prompt[:397] + "..."
             
             prompts.append(enhanced_prompt)
             
-            # Log the enhanced prompt
-            logger.info(f"🎨 Created enhanced prompt {i+1}/{variations}:")
-            logger.info(f"   📝 Base: {base_prompt}")
-            if context_elements:
-                logger.info(f"   🎯 Context: {context_elements[i % len(context_elements)]}")
-            if approach:
-                logger.info(f"   ✨ Style: {approach}")
-            logger.info(f"   🔗 Final: {enhanced_prompt}")
+            # Log the enhanced prompt as one structured record
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🎨 Created enhanced prompt %d/%d: %s", i+1, variations, enhanced_prompt, extra={
+                    "index": i + 1,
+                    "total": variations,
+                    "base": base_prompt,
+                    "context": context_elements[i % len(context_elements)] if context_elements else None,
+                    "approach": approach or None,
+                    "final": enhanced_prompt
+                })
         
-        return prompts
+        return tuple(prompts)
     
     @staticmethod
     async def generate_vertex_imagen_logo(prompt: str, model: str = "imagegeneration@006", location: str = None) -> Dict[str, Any]:
         """Generate logo using Vertex AI Imagen with proper authentication"""
+        results = await VertexImagenLogoGenerator.generate_vertex_imagen_batch([prompt], model, location)
+        return results[0]
+    
+    @staticmethod
+    async def generate_vertex_imagen_batch(prompts: List[str], model: str = "imagegeneration@006", location: str = None) -> List[Dict[str, Any]]:
+        """Generate one logo per prompt with a single Vertex AI Imagen request (one instance per prompt)"""
         try:
             if not location:
                 location = VertexImagenLogoGenerator.DEFAULT_LOCATION
                 
-            logger.info(f"🎨 Starting Vertex AI Imagen generation with {model}")
-            logger.info(f"📍 Location: {location}")
-            logger.info(f"📝 Prompt: {prompt}")
+            if len(prompts) > 1 and model in VertexImagenLogoGenerator.SINGLE_INSTANCE_MODELS:
+                return await VertexImagenLogoGenerator._generate_individually(prompts, model, location)
+            
+            logger.info("🎨 Starting Vertex AI Imagen generation with %s (%s prompt(s))", model, len(prompts))
+            logger.info("📍 Location: %s", location)
+            for prompt in prompts:
+                logger.info("📝 Prompt: %s", prompt)
             
             # Check credentials
             if not CREDENTIALS or not PROJECT_ID:
                 raise Exception("Google Cloud credentials not properly initialized")
             
             # Get access token
-            access_token = VertexImagenLogoGenerator.get_access_token()
+            access_token = await VertexImagenLogoGenerator.get_access_token()
             
             # Get model configuration
-            if model not in VertexImagenLogoGenerator.VERTEX_MODELS:
+            model_config = VertexImagenLogoGenerator.VERTEX_MODELS.get(model)
+            if model_config is None:
                 raise Exception(f"Unsupported model: {model}")
-            
-            model_config = VertexImagenLogoGenerator.VERTEX_MODELS[model]
             endpoint = model_config["base_url"].format(
                 project=PROJECT_ID,
                 location=location
@@ -367,9 +897,13 @@ class VertexImagenLogoGenerator:
                     {
                         "prompt": prompt
                     }
+                    for prompt in prompts
                 ],
                 "parameters": {
                     "sampleCount": 1,
+                    # Filtered instances come back with a reason instead of being dropped,
+                    # which keeps predictions aligned with their prompts
+                    "includeRaiReason": True,
                     "aspectRatio": "1:1",
                     "safetyFilterLevel": "block_some",
                     "personGeneration": "dont_allow"
@@ -381,17 +915,29 @@ class VertexImagenLogoGenerator:
                 "Content-Type": "application/json"
             }
             
-            logger.info(f"🌐 Making request to: {endpoint}")
+            logger.info("🌐 Making request to: %s", endpoint)
             
-            # Make the request
-            response = requests.post(
-                endpoint,
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
+            # Make the request (rate limited to the project's Vertex AI quota)
+            for attempt in range(VERTEX_MAX_RETRIES + 1):
+                await VERTEX_RATE_LIMITER.acquire()
+                try:
+                    async with VERTEX_SEMAPHORE:
+                        response = await app.state.http.post(
+                            endpoint,
+                            json=payload,
+                            headers=headers
+                        )
+                except _RETRYABLE_ERRORS as e:
+                    if attempt == VERTEX_MAX_RETRIES:
+                        raise
+                    logger.warning("⚠️ Vertex AI request failed (%s), retrying in %ss", e, 2 ** attempt)
+                else:
+                    if response.status_code not in _RETRYABLE_STATUS or attempt == VERTEX_MAX_RETRIES:
+                        break
+                    logger.warning("⚠️ Vertex AI HTTP %s, retrying in %ss", response.status_code, 2 ** attempt)
+                await asyncio.sleep(2 ** attempt)
             
-            logger.info(f"📊 Response status: {response.status_code}")
+            logger.info("📊 Response status: %s", response.status_code)
             
             if response.status_code == 200:
                 result = response.json()
@@ -399,92 +945,224 @@ class VertexImagenLogoGenerator:
                 
                 # Extract predictions from Vertex AI response
                 if "predictions" in result and len(result["predictions"]) > 0:
-                    images_data = []
+                    predictions = result["predictions"]
+                    images_per_prompt, filtered = VertexImagenLogoGenerator._map_predictions(prompts, predictions)
+                    
+                    # Only an unaligned response leaves prompts with neither an image nor a filter
+                    # reason; keep the images we did get and regenerate just those prompts
+                    retried = {}
+                    if len(prompts) > 1 and len(predictions) != len(prompts):
+                        missing = [i for i, images in enumerate(images_per_prompt) if not images and filtered[i] is None]
+                        if missing:
+                            logger.warning("⚠️ Got %s predictions for %s prompts - retrying %s unmatched prompt(s) individually",
+                                           len(predictions), len(prompts), len(missing))
+                            retried = dict(zip(missing, await VertexImagenLogoGenerator._generate_individually(
+                                [prompts[i] for i in missing], model, location
+                            )))
                     
-                    for i, prediction in enumerate(result["predictions"]):
-                        logger.info(f"🖼️ Processing prediction {i}")
-                        
-                        if "bytesBase64Encoded" in prediction:
-                            try:
-                                image_data = base64.b64decode(prediction["bytesBase64Encoded"])
-                                images_data.append({
-                                    'image_data': image_data,
-                                    'mime_type': 'image/png',
-                                    'index': i
-                                })
-                                logger.info(f"✅ Successfully decoded image {i}: {len(image_data)} bytes")
-                            except Exception as decode_error:
-                                logger.error(f"❌ Failed to decode image {i}: {str(decode_error)}")
+                    results = []
+                    for i, (prompt, images_data) in enumerate(zip(prompts, images_per_prompt)):
+                        if i in retried:
+                            results.append(retried[i])
+                        elif images_data:
+                            results.append({
+                                'success': True,
+                                'images': images_data,
+                                'original_prompt': prompt,
+                                'model': model,
+                                'location': location
+                            })
                         else:
-                            logger.error(f"❌ No bytesBase64Encoded in prediction {i}")
+                            results.append({
+                                'success': False,
+                                'error': f"Blocked by Vertex AI safety filters: {filtered[i]}" if filtered[i] else 'No valid images in response'
+                            })
                     
-                    if images_data:
-                        logger.info(f"✅ Generated {len(images_data)} image(s) successfully with Vertex AI")
-                        return {
-                            'success': True,
-                            'images': images_data,
-                            'original_prompt': prompt,
-                            'model': model,
-                            'location': location,
-                            'raw_response': result
-                        }
-                    else:
-                        return {
-                            'success': False,
-                            'error': 'No valid images in response',
-                            'raw_response': result
-                        }
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info("✅ Generated %d image(s) with Vertex AI", sum(len(images) for images in images_per_prompt))
+                    return results
                 else:
                     logger.error("❌ No predictions found in Vertex AI response")
-                    return {
+                    return [{
                         'success': False,
                         'error': 'No predictions in response',
                         'raw_response': result
-                    }
+                    } for _ in prompts]
             else:
                 error_text = response.text if response.content else "No error details"
-                logger.error(f"❌ Vertex AI HTTP {response.status_code}: {error_text}")
+                logger.error("❌ Vertex AI HTTP %s: %s", response.status_code, error_text)
+                
+                # The model may reject multi-instance requests - fall back to one request per prompt,
+                # and stop batching for it once the same prompts are accepted individually
+                if response.status_code == 400 and len(prompts) > 1:
+                    results = await VertexImagenLogoGenerator._generate_individually(prompts, model, location)
+                    if any(result.get('success') for result in results):
+                        logger.warning("⚠️ %s rejects multi-instance requests - no longer batching its prompts", model)
+                        VertexImagenLogoGenerator.SINGLE_INSTANCE_MODELS.add(model)
+                    return results
                 
-                return {
+                return [{
                     'success': False,
                     'error': f"Vertex AI HTTP {response.status_code}: {error_text}",
                     'status_code': response.status_code
-                }
+                } for _ in prompts]
                 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"❌ Vertex AI Imagen generation exception: {error_msg}")
-            return {
+            logger.error("❌ Vertex AI Imagen generation exception: %s", error_msg)
+            return [{
                 'success': False,
                 'error': error_msg
-            }
+            } for _ in prompts]
     
     @staticmethod
-    async def save_vertex_logo(image_data: bytes, logo_id: str, variation: int, base_url: str = "http://localhost:8000") -> tuple[str, str]:
-        """Save Vertex AI Imagen logo locally"""
+    def _map_predictions(prompts: List[str], predictions: List[Dict[str, Any]]) -> Tuple[List[list], List[Optional[str]]]:
+        """Route predictions back to their prompts: (images per prompt, safety-filter reason per prompt)
+        
+        With includeRaiReason every instance keeps its slot, so predictions map by position. If the
+        counts still differ, only predictions that echo their prompt can be attributed; the other
+        prompts end up with neither images nor a reason.
+        """
+        images_per_prompt: List[list] = [[] for _ in prompts]
+        filtered: List[Optional[str]] = [None] * len(prompts)
+        if len(prompts) == 1:
+            slots = [0] * len(predictions)
+        elif len(predictions) == len(prompts):
+            slots = range(len(predictions))
+        else:
+            positions = {prompt: i for i, prompt in enumerate(prompts)}
+            slots = [positions.get(prediction.get("prompt")) for prediction in predictions]
+        
+        for i, (slot, prediction) in enumerate(zip(slots, predictions)):
+            if slot is None:
+                logger.warning("⚠️ Prediction %s can't be matched to a prompt - dropped", i)
+            elif prediction.get("bytesBase64Encoded"):
+                # Decoding is deferred to save_vertex_logo, off the event loop
+                images = images_per_prompt[slot]
+                images.append({
+                    'image_b64': prediction["bytesBase64Encoded"],
+                    'mime_type': 'image/png',
+                    'index': len(images)
+                })
+                logger.info("✅ Received image %s: %s base64 chars", i, len(prediction['bytesBase64Encoded']))
+            elif prediction.get("raiFilteredReason"):
+                filtered[slot] = prediction["raiFilteredReason"]
+                logger.warning("🚫 Prediction %s filtered: %s", i, filtered[slot])
+            else:
+                logger.error("❌ No bytesBase64Encoded in prediction %s", i)
+        return images_per_prompt, filtered
+    
+    @staticmethod
+    async def _generate_individually(prompts: List[str], model: str, location: str) -> List[Dict[str, Any]]:
+        """Issue one Vertex AI request per prompt, concurrently"""
+        return list(await asyncio.gather(
+            *(VertexImagenLogoGenerator.generate_vertex_imagen_logo(prompt, model, location) for prompt in prompts)
+        ))
+    
+    @staticmethod
+    async def save_vertex_logo(image_b64: str, logo_id: str, base_url: str = "http://localhost:8000",
+                               cache_key: Optional[str] = None) -> tuple[str, str]:
+        """Save Vertex AI Imagen logo locally (and into the prompt cache when `cache_key` is given)"""
         try:
-            logger.info(f"💾 Saving Vertex AI Imagen logo: {logo_id} (v{variation})")
+            logger.info("💾 Saving Vertex AI Imagen logo: %s", logo_id)
+            
+            # Decode and write in a worker thread so the event loop keeps serving requests
+            png_path = logo_file_path(logo_id, "png")
+            cache_path = os.path.join(LOGO_CACHE_DIR, f"{cache_key}.png") if cache_key else None
+            await asyncio.to_thread(VertexImagenLogoGenerator._decode_and_write, image_b64, png_path, cache_path)
+            logger.info("✅ PNG saved: %s", png_path)
             
-            if not image_data or len(image_data) < 100:
-                raise Exception("Invalid or empty image data")
+            local_url = f"{base_url}/static/logos/{logo_id}.png"
+            return local_url, png_path
             
-            # Save PNG
-            png_path = f"generated_logos/{logo_id}_v{variation}.png"
-            with open(png_path, 'wb') as f:
-                f.write(image_data)
-            logger.info(f"✅ PNG saved: {png_path}")
+        except Exception as e:
+            logger.error("❌ Save error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Failed to save logo: {str(e)}")
+    
+    @staticmethod
+    def _decode_and_write(image_b64: str, png_path: str, cache_path: Optional[str] = None):
+        """Blocking half of save_vertex_logo: decode base64 and write the PNG.
+        
+        Always runs in the blocking thread pool, so plain file I/O never stalls the event loop.
+        Nothing is fsync'ed - files are served from page cache right after generation.
+        """
+        image_data = base64.b64decode(image_b64, validate=False)
+        
+        # Parse the PNG header/chunk structure (no pixel decode) before anything touches disk
+        try:
+            with Image.open(BytesIO(image_data)) as im:
+                im.verify()
+                image_format = im.format
+        except Exception as e:
+            raise Exception(f"Invalid or empty image data: {str(e)}")
+        if image_format != "PNG":
+            raise Exception(f"Unexpected image format: {image_format}")
+        
+        # Write to a temp file and rename so partial files never appear under /static/logos
+        target_path = cache_path or png_path
+        tmp_path = f"{target_path}.{os.path.basename(png_path)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image_data)
+        os.replace(tmp_path, target_path)
+        
+        if cache_path:
+            _link_or_copy(cache_path, png_path)
+    
+    @staticmethod
+    def prompt_cache_key(prompt: str, model: str) -> str:
+        """Content address for a generated image"""
+        return hashlib.blake2b(f"{model}|{prompt}".encode(), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _cache_entry_fresh(cache_path: str) -> bool:
+        """One stat: does the cache entry exist and is it younger than LOGO_CACHE_TTL"""
+        try:
+            mtime = os.stat(cache_path).st_mtime
+        except FileNotFoundError:
+            return False
+        # A stale entry is simply overwritten (os.replace) by the next generation
+        return not LOGO_CACHE_TTL or time.time() - mtime < LOGO_CACHE_TTL
+    
+    @staticmethod
+    async def cached_result(prompt: str, model: str, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a generation result backed by the prompt cache, or None on a miss"""
+        cache_path = os.path.join(LOGO_CACHE_DIR, f"{cache_key}.png")
+        if not LOGO_CACHE_ENABLED or not await asyncio.to_thread(VertexImagenLogoGenerator._cache_entry_fresh, cache_path):
+            return None
+        
+        logger.info("♻️ Prompt cache hit: %s", cache_key)
+        return {
+            'success': True,
+            'images': [{
+                'cache_path': cache_path,
+                'mime_type': 'image/png',
+                'index': 0
+            }],
+            'original_prompt': prompt,
+            'model': model,
+            'location': VertexImagenLogoGenerator.DEFAULT_LOCATION,
+            'cached': True
+        }
+    
+    @staticmethod
+    async def link_cached_logo(cache_path: str, logo_id: str, base_url: str = "http://localhost:8000") -> tuple[str, str]:
+        """Expose a cached image under a new logo id without regenerating it"""
+        try:
+            png_path = logo_file_path(logo_id, "png")
+            await asyncio.to_thread(_link_or_copy, cache_path, png_path)
+            logger.info("✅ PNG linked from cache: %s", png_path)
             
-            local_url = f"{base_url}/static/logos/{logo_id}_v{variation}.png"
+            local_url = f"{base_url}/static/logos/{logo_id}.png"
             return local_url, png_path
             
         except Exception as e:
-            logger.error(f"❌ Save error: {str(e)}")
+            logger.error("❌ Save error: %s", e)
             raise HTTPException(status_code=500, detail=f"Failed to save logo: {str(e)}")
     
     @staticmethod
     async def create_vertex_logos(request: LogoGenerationRequest, base_url: str = "http://localhost:8000") -> List[LogoResponse]:
         """Create professional logos using Vertex AI Imagen with enhanced business context"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             variations = getattr(request, 'variations', 1)
@@ -492,13 +1170,13 @@ class VertexImagenLogoGenerator:
             
             model = getattr(request, 'imagen_model', 'imagegeneration@006')
             
-            logger.info(f"🎯 Creating {variations} enhanced Vertex AI Imagen logo(s) for: {request.business_info.name}")
-            logger.info(f"🤖 Using model: {model}")
-            logger.info(f"🏢 Industry: {request.business_info.industry}")
+            logger.info("🎯 Creating %s enhanced Vertex AI Imagen logo(s) for: %s", variations, request.business_info.name)
+            logger.info("🤖 Using model: %s", model)
+            logger.info("🏢 Industry: %s", request.business_info.industry)
             if request.business_info.description:
-                logger.info(f"📝 Description: {request.business_info.description}")
+                logger.info("📝 Description: %s", request.business_info.description)
             if request.business_info.target_audience:
-                logger.info(f"🎯 Target Audience: {request.business_info.target_audience}")
+                logger.info("🎯 Target Audience: %s", request.business_info.target_audience)
             
             # Validate request
             if not request.business_info.name.strip():
@@ -515,64 +1193,99 @@ class VertexImagenLogoGenerator:
                 request.business_info.target_audience  # Now includes target audience
             )
             
+            # Up to `variations` entries (one image per prompt); failed or filtered images are
+            # skipped, so the list is appended to rather than preallocated
             logos = []
-            base_id = hashlib.md5(f"{request.business_info.name}_{time.time()}".encode()).hexdigest()[:12]
+            base_id = secrets.token_hex(6)
             successful_generations = 0
             errors = []
             
-            for i, prompt in enumerate(prompts):
-                try:
-                    logger.info(f"🔄 Generating logo {i+1}/{len(prompts)} with Vertex AI")
-                    
-                    # Generate logo with Vertex AI
-                    vertex_result = await VertexImagenLogoGenerator.generate_vertex_imagen_logo(prompt, model)
-                    
-                    if vertex_result.get('success') and vertex_result.get('images'):
-                        for img_idx, img_data in enumerate(vertex_result['images']):
-                            logo_id = f"{base_id}_{i+1}_{img_idx+1}"
-                            variation_num = successful_generations + 1
-                            
-                            # Save logo
-                            local_url, local_path = await VertexImagenLogoGenerator.save_vertex_logo(
-                                img_data['image_data'], 
-                                base_id,
-                                variation_num,
-                                base_url
-                            )
-                            
-                            logo = LogoResponse(
-                                id=logo_id,
-                                name=f"{request.business_info.name} Logo (Vertex AI {variation_num})",
-                                image_url=local_url,
-                                local_path=local_path,
-                                style_info={
-                                    "style": request.style.style_type,
-                                    "variation": variation_num,
-                                    "ai_model": f"Google Vertex AI {model}",
-                                    "quality": "Professional HD",
-                                    "industry": request.business_info.industry,
-                                    "generation_method": "Enhanced Vertex AI Imagen Generation",
-                                    "location": vertex_result.get('location', 'us-central1'),
-                                    "business_context": "Enhanced with business description" if request.business_info.description else "Standard generation"
-                                },
-                                colors_used=request.style.color_palette[:2],
-                                generation_time=time.time() - start_time,
-                                confidence_score=0.95,
-                                prompt_used=prompt
-                            )
-                            
-                            logos.append(logo)
-                            successful_generations += 1
-                            logger.info(f"✅ Created enhanced Vertex AI logo {variation_num}: {logo_id}")
-                    else:
-                        error_msg = vertex_result.get('error', 'Unknown error')
-                        logger.error(f"❌ Failed to create Vertex AI logo {i+1}: {error_msg}")
-                        errors.append(f"Logo {i+1}: {error_msg}")
-                        
-                except Exception as e:
-                    logger.error(f"❌ Failed to create Vertex AI logo {i+1}: {str(e)}")
-                    errors.append(f"Logo {i+1}: {str(e)}")
+            # Serve repeated prompts from the content-addressed cache
+            cache_keys = [VertexImagenLogoGenerator.prompt_cache_key(prompt, model) for prompt in prompts]
+            vertex_results = list(await asyncio.gather(*(
+                VertexImagenLogoGenerator.cached_result(prompt, model, key)
+                for prompt, key in zip(prompts, cache_keys)
+            )))
+            misses = [i for i, result in enumerate(vertex_results) if result is None]
+            
+            # Fan out the remaining Vertex AI calls concurrently (coalesced into batched requests)
+            if misses:
+                logger.info("🔄 Generating %s logo(s) concurrently with Vertex AI", len(misses))
+                generated = await asyncio.gather(
+                    *(imagen_batcher.submit(prompts[i], model) for i in misses),
+                    return_exceptions=True
+                )
+                for i, result in zip(misses, generated):
+                    vertex_results[i] = result
+            
+            # Collect successful images, numbering variations in prompt order
+            pending = []
+            for i, (prompt, vertex_result) in enumerate(zip(prompts, vertex_results)):
+                if isinstance(vertex_result, Exception):
+                    logger.error("❌ Failed to create Vertex AI logo %s: %s", i+1, vertex_result)
+                    errors.append(f"Logo {i+1}: {str(vertex_result)}")
+                elif vertex_result.get('success') and vertex_result.get('images'):
+                    for img_idx, img_data in enumerate(vertex_result['images']):
+                        successful_generations += 1
+                        cache_key = cache_keys[i] if LOGO_CACHE_ENABLED and img_idx == 0 else None
+                        pending.append((i, img_idx, img_data, prompt, vertex_result, successful_generations, cache_key))
+                else:
+                    error_msg = vertex_result.get('error', 'Unknown error')
+                    logger.error("❌ Failed to create Vertex AI logo %s: %s", i+1, error_msg)
+                    errors.append(f"Logo {i+1}: {error_msg}")
+            
+            # Save all images concurrently
+            saved = await asyncio.gather(
+                *(VertexImagenLogoGenerator.link_cached_logo(img_data['cache_path'], f"{base_id}_{i+1}_{img_idx+1}", base_url)
+                  if 'cache_path' in img_data else
+                  VertexImagenLogoGenerator.save_vertex_logo(img_data['image_b64'], f"{base_id}_{i+1}_{img_idx+1}", base_url, cache_key)
+                  for i, img_idx, img_data, _, _, _, cache_key in pending),
+                return_exceptions=True
+            )
+            
+            # Identical for every logo in this request (all images finished with the gather above)
+            generation_time = time.perf_counter() - start_time
+            display_name = request.business_info.name
+            colors_used = request.style.color_palette[:2]
+            shared_style_info = {
+                "style": request.style.style_type,
+                "ai_model": f"Google Vertex AI {model}",
+                "quality": "Professional HD",
+                "industry": request.business_info.industry,
+                "generation_method": "Enhanced Vertex AI Imagen Generation",
+                "business_context": "Enhanced with business description" if request.business_info.description else "Standard generation"
+            }
+            
+            for (i, img_idx, img_data, prompt, vertex_result, variation_num, _), save_result in zip(pending, saved):
+                if isinstance(save_result, Exception):
+                    error_msg = save_result.detail if isinstance(save_result, HTTPException) else str(save_result)
+                    logger.error("❌ Failed to create Vertex AI logo %s: %s", i+1, error_msg)
+                    errors.append(f"Logo {i+1}: {error_msg}")
                     continue
+                
+                local_url, local_path = save_result
+                logo_id = f"{base_id}_{i+1}_{img_idx+1}"
+                
+                # Every field comes from validated request data or our own values, so skip re-validation
+                logo = LogoResponse.model_construct(
+                    id=logo_id,
+                    name=f"{display_name} Logo (Vertex AI {variation_num})",
+                    image_url=local_url,
+                    local_path=local_path,
+                    style_info={
+                        **shared_style_info,
+                        "variation": variation_num,
+                        "location": vertex_result.get('location', 'us-central1')
+                    },
+                    colors_used=colors_used,
+                    generation_time=generation_time,
+                    confidence_score=0.95,
+                    prompt_used=prompt,
+                    cached='cache_path' in img_data
+                )
+                
+                logos.append(logo)
+                logger.info("✅ Created enhanced Vertex AI logo %s: %s", variation_num, logo_id)
             
             if not logos:
                 error_summary = "; ".join(errors) if errors else "Unknown errors occurred"
@@ -581,23 +1294,191 @@ class VertexImagenLogoGenerator:
                     detail=f"All Vertex AI logo generations failed. Errors: {error_summary}"
                 )
             
-            logger.info(f"✅ Successfully generated {len(logos)} out of {variations} requested enhanced logos with Vertex AI")
+            logger.info("✅ Successfully generated %s out of %s requested enhanced logos with Vertex AI", len(logos), variations)
             return logos
                 
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"❌ Vertex AI logo creation error: {str(e)}")
+            logger.error("❌ Vertex AI logo creation error: %s", e)
             raise HTTPException(status_code=500, detail=f"Vertex AI logo creation failed: {str(e)}")
 
+# ================== REQUEST BATCHING ==================
+
+class ImagenBatcher:
+    """Coalesce concurrent Imagen prompts into multi-instance Vertex AI requests.
+    
+    Prompts are collected for up to `max_wait` seconds (or until `max_batch` are queued),
+    grouped by (model, location) and sent as one request per group. A prompt that is
+    already queued or in flight is not sent again - later callers share its result.
+    """
+    
+    def __init__(self, max_batch: int = 4, max_wait: float = 0.05):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: set = set()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+    
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def submit(self, prompt: str, model: str = "imagegeneration@006", location: str = None) -> Dict[str, Any]:
+        """Queue a prompt (or join an identical one in flight) and wait for its generation result"""
+        self.start()
+        key = (prompt, model, location or VertexImagenLogoGenerator.DEFAULT_LOCATION)
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+            future.add_done_callback(functools.partial(self._forget, key))
+            await self._queue.put((*key, future))
+        # Shielded so a caller that disconnects doesn't cancel the result for the others
+        return await asyncio.shield(future)
+    
+    def _forget(self, key: tuple, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # mark retrieved even if every waiter has gone away
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Nothing to coalesce for a model that only takes one instance per request
+            max_batch = 1 if batch[0][1] in VertexImagenLogoGenerator.SINGLE_INSTANCE_MODELS else self.max_batch
+            deadline = loop.time() + self.max_wait
+            while len(batch) < max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            groups: Dict[tuple, list] = {}
+            for prompt, model, location, future in batch:
+                groups.setdefault((model, location), []).append((prompt, future))
+            
+            for (model, location), items in groups.items():
+                single = model in VertexImagenLogoGenerator.SINGLE_INSTANCE_MODELS
+                for chunk in ([item] for item in items) if single else [items]:
+                    task = asyncio.create_task(self._dispatch(model, location, chunk))
+                    self._dispatches.add(task)
+                    task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, model: str, location: str, items: list):
+        try:
+            results = await VertexImagenLogoGenerator.generate_vertex_imagen_batch(
+                [prompt for prompt, _ in items], model, location
+            )
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+imagen_batcher = ImagenBatcher(
+    max_batch=int(os.getenv("IMAGEN_BATCH_MAX_SIZE", "4")),
+    max_wait=float(os.getenv("IMAGEN_BATCH_MAX_WAIT_MS", "50")) / 1000
+)
+
+class FeedbackWriter:
+    """Append feedback records to a JSONL file in batches, off the request path.
+    
+    Records are buffered for up to `max_wait` seconds (or until `max_batch` are queued)
+    and written with a single append in the blocking thread pool.
+    """
+    
+    def __init__(self, path: str, max_batch: int = 100, max_wait: float = 1.0):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush everything queued so far, then stop the writer"""
+        if self._worker is not None:
+            self._queue.put_nowait(None)
+            await self._worker
+            self._worker = None
+    
+    def submit(self, record: Dict[str, Any]):
+        self.start()
+        self._queue.put_nowait(record)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            if None in batch:
+                stopping = True
+                batch = [record for record in batch if record is not None]
+            if batch:
+                # Any failure (disk, or a record orjson can't serialize) costs only this batch;
+                # the writer has to outlive it or later feedback would silently go unwritten
+                try:
+                    await asyncio.to_thread(self._write, batch)
+                except Exception as e:
+                    logger.error("❌ Failed to write %s feedback record(s): %s", len(batch), e)
+    
+    def _write(self, batch: List[Dict[str, Any]]):
+        # One unbuffered O_APPEND write per batch, so batches from other workers never interleave
+        with open(self.path, "ab", buffering=0) as f:
+            f.write(b"".join(orjson.dumps(record) + b"\n" for record in batch))
+
+feedback_writer = FeedbackWriter(os.path.join(DATA_DIR, "feedback.jsonl"))
+
 # ================== COMPREHENSIVE DIAGNOSTICS ==================
 
+# The model test is a paid Imagen generation, so it only runs when asked for
+RUN_LIVE_DIAG = os.getenv("RUN_LIVE_DIAG", "0") == "1"
+
 class VertexAIDiagnostics:
     """Comprehensive diagnostics for Vertex AI setup"""
     
     @staticmethod
-    async def full_vertex_diagnostic() -> Dict[str, Any]:
-        """Run comprehensive diagnostics on Vertex AI setup"""
+    def model_ready(results: Dict[str, Any]) -> bool:
+        """True unless the Imagen model test ran and failed"""
+        return results["model_access"].get("imagegeneration@006") in ("working", "skipped")
+    
+    @staticmethod
+    async def full_vertex_diagnostic(reinitialize: bool = True, live: bool = RUN_LIVE_DIAG) -> Dict[str, Any]:
+        """Run comprehensive diagnostics on Vertex AI setup
+        
+        Each test needs the previous one to pass, so they run in sequence; blocking auth
+        work runs in the thread pool. Pass reinitialize=False when credentials were just loaded.
+        The Imagen model test only runs with live=True (it generates, and bills, one image).
+        """
         results = {
             "credentials_status": "unknown",
             "project_status": "unknown",
@@ -608,11 +1489,11 @@ class VertexAIDiagnostics:
         
         # Test 1: Check credentials initialization
         try:
-            auth_success = initialize_google_auth()
+            auth_success = await asyncio.to_thread(initialize_google_auth) if reinitialize else bool(CREDENTIALS)
             if auth_success and CREDENTIALS and PROJECT_ID:
                 results["credentials_status"] = "valid"
                 results["project_status"] = f"detected: {PROJECT_ID}"
-                logger.info(f"✅ Credentials valid, project: {PROJECT_ID}")
+                logger.info("✅ Credentials valid, project: %s", PROJECT_ID)
             else:
                 results["credentials_status"] = "invalid"
                 results["recommendations"].append("Set up Google Cloud authentication (service account or gcloud auth)")
@@ -627,12 +1508,12 @@ class VertexAIDiagnostics:
         try:
             logger.info("🔍 Testing Vertex AI API access...")
             
-            access_token = VertexImagenLogoGenerator.get_access_token()
+            access_token = await VertexImagenLogoGenerator.get_access_token()
             
             # Test with a simple Vertex AI endpoint (list models)
             test_url = f"https://us-central1-aiplatform.googleapis.com/v1/projects/{PROJECT_ID}/locations/us-central1/models"
             
-            response = requests.get(
+            response = await app.state.http.get(
                 test_url,
                 headers={
                     "Authorization": f"Bearer {access_token}",
@@ -641,7 +1522,7 @@ class VertexAIDiagnostics:
                 timeout=30
             )
             
-            logger.info(f"📊 Vertex AI test response: {response.status_code}")
+            logger.info("📊 Vertex AI test response: %s", response.status_code)
             
             if response.status_code == 200:
                 results["vertex_api_access"] = "working"
@@ -657,12 +1538,14 @@ class VertexAIDiagnostics:
                 results["recommendations"].append(f"Vertex AI API returned {response.status_code}")
                 
         except Exception as e:
-            logger.error(f"❌ Vertex AI test failed: {str(e)}")
+            logger.error("❌ Vertex AI test failed: %s", e)
             results["vertex_api_access"] = f"error: {str(e)}"
             results["recommendations"].append("Check network connectivity and Vertex AI API configuration")
         
         # Test 3: Test Imagen model access
-        if results["vertex_api_access"] == "working":
+        if results["vertex_api_access"] == "working" and not live:
+            results["model_access"]["imagegeneration@006"] = "skipped"
+        elif results["vertex_api_access"] == "working":
             try:
                 logger.info("🎨 Testing Imagen model access...")
                 
@@ -691,8 +1574,43 @@ async def startup_event():
     logger.info("🚀 Enhanced Vertex AI Imagen Logo Generator Starting...")
     logger.info("✨ NEW: Business description and target audience integration!")
     
-    # Initialize Google Cloud authentication
-    auth_success = initialize_google_auth()
+    # uvicorn silently falls back to the pure-Python asyncio loop when uvloop is missing
+    loop_policy = type(asyncio.get_event_loop_policy())
+    if loop_policy.__module__.startswith("uvloop"):
+        logger.info("⚡ Event loop: uvloop")
+    else:
+        logger.warning("⚠️ Event loop: %s.%s (install uvicorn[standard] for uvloop)", loop_policy.__module__, loop_policy.__name__)
+    
+    # One bounded thread pool for all blocking work (file I/O, base64/PIL, google-auth refresh);
+    # asyncio.to_thread and run_in_executor(None, ...) both use it
+    app.state.blocking_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) * 4),
+        thread_name_prefix="blocking"
+    )
+    asyncio.get_running_loop().set_default_executor(app.state.blocking_pool)
+    
+    # One shared HTTP client for every Vertex AI call (pooled TLS connections + HTTP/2 to googleapis.com);
+    # the timeout stays above Imagen's typical generation latency
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100)
+    )
+    
+    # Short socket timeouts so a Redis outage degrades to per-worker limits instead of stalling requests
+    if REDIS_URL:
+        app.state.redis = aioredis.from_url(REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        app.state.redis_rate_limits = RedisSlidingWindowLimiter(
+            app.state.redis, RATE_LIMIT_WINDOW, RATE_LIMIT_RPM, RATE_LIMIT_IPM
+        )
+        logger.info("🔗 Rate limits shared through Redis")
+    
+    imagen_batcher.start()
+    feedback_writer.start()
+    app.state.rate_limit_gc = asyncio.create_task(evict_idle_rate_limits())
+    
+    # Initialize Google Cloud authentication (file reads + metadata-server probes, so off the loop)
+    auth_success = await asyncio.to_thread(initialize_google_auth)
     
     if not auth_success:
         logger.error("❌ CRITICAL: Google Cloud authentication failed!")
@@ -707,92 +1625,127 @@ async def startup_event():
     
     # Run comprehensive diagnostics
     logger.info("🔍 Running comprehensive Vertex AI diagnostics...")
-    diagnostic_results = await VertexAIDiagnostics.full_vertex_diagnostic()
+    diagnostic_results = await VertexAIDiagnostics.full_vertex_diagnostic(reinitialize=False)
     
     logger.info("🏥 Diagnostic Results:")
-    logger.info(f"  Credentials: {diagnostic_results['credentials_status']}")
-    logger.info(f"  Project: {diagnostic_results['project_status']}")
-    logger.info(f"  Vertex AI Access: {diagnostic_results['vertex_api_access']}")
-    logger.info(f"  Model Access: {diagnostic_results['model_access']}")
+    logger.info("  Credentials: %s", diagnostic_results['credentials_status'])
+    logger.info("  Project: %s", diagnostic_results['project_status'])
+    logger.info("  Vertex AI Access: %s", diagnostic_results['vertex_api_access'])
+    logger.info("  Model Access: %s", diagnostic_results['model_access'])
     
     if diagnostic_results['recommendations']:
         logger.info("💡 Recommendations:")
         for rec in diagnostic_results['recommendations']:
-            logger.info(f"  • {rec}")
+            logger.info("  • %s", rec)
     
     if (diagnostic_results['credentials_status'] == 'valid' and 
         diagnostic_results['vertex_api_access'] == 'working' and
-        diagnostic_results['model_access'].get('imagegeneration@006') == 'working'):
+        VertexAIDiagnostics.model_ready(diagnostic_results)):
         logger.info("✅ All systems ready for enhanced Vertex AI Imagen logo generation!")
     else:
         logger.warning("⚠️ Some issues detected - check recommendations above")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await imagen_batcher.stop()
+    await feedback_writer.stop()
+    rate_limit_gc = getattr(app.state, "rate_limit_gc", None)
+    if rate_limit_gc is not None:
+        rate_limit_gc.cancel()
+    http_client = getattr(app.state, "http", None)
+    if http_client is not None:
+        await http_client.aclose()
+        del app.state.http
+    redis_client = getattr(app.state, "redis", None)
+    if redis_client is not None:
+        del app.state.redis_rate_limits
+        await redis_client.aclose()
+        del app.state.redis
+    blocking_pool = getattr(app.state, "blocking_pool", None)
+    if blocking_pool is not None:
+        blocking_pool.shutdown(wait=True)
+    logger.info("👋 Vertex AI Imagen Logo Generator stopped")
+
+def _json_bytes(payload: Dict[str, Any]) -> bytes:
+    """Serialize a payload the same way the app's default ORJSONResponse does"""
+    return orjson.dumps(payload)
+
+# Serialized root payload, rebuilt at most once a second (so "timestamp" stays current)
+# or when the auth state it reports changes
+_ROOT_JSON: Dict[tuple, bytes] = {}
+
 @app.get("/")
 async def root():
-    return {
-        "message": "Enhanced Vertex AI Imagen Logo Generator with Business Context",
-        "version": "8.1.0-enhanced",
-        "status": "healthy" if CREDENTIALS and PROJECT_ID else "auth_missing",
-        "features": [
-            "Google Vertex AI Imagen Generation",
-            "Business Description Integration",
-            "Target Audience Optimization",
-            "Enhanced Prompt Generation",
-            "Proper OAuth2 Authentication",
-            "Service Account Support",
-            "Comprehensive Diagnostics",
-            "Professional Logo Design"
-        ],
-        "models": {
-            "imagegeneration@006": "$0.03 per image - Latest Imagen model",
-            "imagegeneration@005": "$0.025 per image - Previous generation"
-        },
-        "enhancements": {
-            "business_context": "Logos now reflect business description and industry",
-            "target_audience": "Design adapts to specified target demographics",
-            "variations": "Multiple meaningful variations per generation",
-            "prompt_intelligence": "Enhanced AI prompt generation with context"
-        },
-        "project_id": PROJECT_ID,
-        "credentials_configured": bool(CREDENTIALS),
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    state = (int(time.time()), bool(CREDENTIALS), PROJECT_ID)
+    content = _ROOT_JSON.get(state)
+    if content is None:
+        _ROOT_JSON.clear()
+        content = _ROOT_JSON[state] = _json_bytes({
+            "message": "Enhanced Vertex AI Imagen Logo Generator with Business Context",
+            "version": "8.1.0-enhanced",
+            "status": "healthy" if CREDENTIALS and PROJECT_ID else "auth_missing",
+            "features": [
+                "Google Vertex AI Imagen Generation",
+                "Business Description Integration",
+                "Target Audience Optimization",
+                "Enhanced Prompt Generation",
+                "Proper OAuth2 Authentication",
+                "Service Account Support",
+                "Comprehensive Diagnostics",
+                "Professional Logo Design"
+            ],
+            "models": {
+                "imagegeneration@006": "$0.03 per image - Latest Imagen model",
+                "imagegeneration@005": "$0.025 per image - Previous generation"
+            },
+            "enhancements": {
+                "business_context": "Logos now reflect business description and industry",
+                "target_audience": "Design adapts to specified target demographics",
+                "variations": "Multiple meaningful variations per generation",
+                "prompt_intelligence": "Enhanced AI prompt generation with context"
+            },
+            "project_id": PROJECT_ID,
+            "credentials_configured": bool(CREDENTIALS),
+            "timestamp": _now_iso()
+        })
+    # Live status with a timestamp: shared proxies mustn't serve it stale
+    return Response(content, media_type="application/json", headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/v1/diagnostics")
-async def run_full_diagnostics():
-    """Run comprehensive Vertex AI diagnostics"""
+async def run_full_diagnostics(live: bool = False):
+    """Run comprehensive Vertex AI diagnostics (?live=true also runs a paid test generation)"""
     try:
         logger.info("🔍 Running on-demand Vertex AI diagnostics...")
         
-        diagnostic_results = await VertexAIDiagnostics.full_vertex_diagnostic()
+        diagnostic_results = await VertexAIDiagnostics.full_vertex_diagnostic(live=live or RUN_LIVE_DIAG)
         
         return {
             "status": "complete",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": _now_iso(),
             "results": diagnostic_results,
             "summary": {
                 "ready_for_generation": (
                     diagnostic_results['credentials_status'] == 'valid' and 
                     diagnostic_results['vertex_api_access'] == 'working' and
-                    diagnostic_results['model_access'].get('imagegeneration@006') == 'working'
+                    VertexAIDiagnostics.model_ready(diagnostic_results)
                 ),
                 "main_issues": diagnostic_results['recommendations'][:3]
             }
         }
         
     except Exception as e:
-        logger.error(f"❌ Diagnostics failed: {str(e)}")
+        logger.error("❌ Diagnostics failed: %s", e)
         return {
             "status": "error",
             "message": f"Diagnostics failed: {str(e)}",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": _now_iso()
         }
 
 @app.post("/api/v1/generate-logos", response_model=Dict[str, Any])
-async def generate_vertex_logos_endpoint(request: LogoGenerationRequest):
+async def generate_vertex_logos_endpoint(request: LogoGenerationRequest, http_request: Request):
     """Generate professional logos using enhanced Vertex AI Imagen with business context"""
     try:
-        logger.info(f"🎯 Request: Generate enhanced Vertex AI Imagen logos for '{request.business_info.name}'")
+        logger.info("🎯 Request: Generate enhanced Vertex AI Imagen logos for '%s'", request.business_info.name)
         
         # Validate authentication
         if not CREDENTIALS or not PROJECT_ID:
@@ -802,110 +1755,99 @@ async def generate_vertex_logos_endpoint(request: LogoGenerationRequest):
             )
         
         model = getattr(request, 'imagen_model', 'imagegeneration@006')
-        model_config = VertexImagenLogoGenerator.VERTEX_MODELS.get(model, VertexImagenLogoGenerator.VERTEX_MODELS['imagegeneration@006'])
+        model_config = VertexImagenLogoGenerator.VERTEX_MODELS.get(model, VertexImagenLogoGenerator.DEFAULT_MODEL_CONFIG)
         cost_per_image = model_config['cost']
         
-        logger.info(f"💰 Estimated cost: ${cost_per_image * request.variations:.3f}")
+        logger.info("💰 Estimated cost: $%.3f", cost_per_image * request.variations)
         
-        # Rate limiting
-        client_id = "anonymous"
-        current_time = time.time()
-        if client_id in rate_limits:
-            time_since_last = current_time - rate_limits[client_id]["last_request"]
-            if time_since_last < 30:  # 30 seconds between requests
-                wait_time = 30 - time_since_last
-                raise HTTPException(
-                    status_code=429, 
-                    detail=f"Please wait {wait_time:.0f} seconds between logo generations"
-                )
-        
-        rate_limits[client_id] = {"last_request": current_time}
+        # Charged only once the server can actually generate, so misconfiguration doesn't eat quotas
+        await enforce_client_rate_limit(http_request, request.variations)
         
         # Generate enhanced Vertex AI Imagen logos
-        start_time = time.time()
+        start_time = time.perf_counter()
         logos = await VertexImagenLogoGenerator.create_vertex_logos(request)
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         
-        # Calculate actual cost
-        total_cost = len(logos) * cost_per_image
+        # Calculate actual cost - cache hits made no Vertex AI call
+        cache_hits = sum(logo.cached for logo in logos)
+        total_cost = (len(logos) - cache_hits) * cost_per_image
         
-        # Create stats
-        stats = GenerationStats(
+        # Create stats (server-computed values only, nothing to validate)
+        stats = GenerationStats.model_construct(
             total_time=total_time,
             logos_generated=len(logos),
             ai_model=f"Google Vertex AI {model}",
             quality="Professional HD Enhanced",
             approximate_cost=f"${total_cost:.3f}",
-            real_ai_generated=True
+            real_ai_generated=cache_hits < len(logos),
+            cache_hits=cache_hits
         )
         
-        logger.info(f"✅ {len(logos)} enhanced Vertex AI Imagen logos generated successfully!")
-        logger.info(f"💰 Actual cost: ${total_cost:.3f}")
-        logger.info(f"⏱️ Total time: {total_time:.1f}s")
+        logger.info("✅ %s enhanced Vertex AI Imagen logos generated successfully!", len(logos))
+        logger.info("💰 Actual cost: $%.3f (%s served from cache)", total_cost, cache_hits)
+        logger.info("⏱️ Total time: %.1fs", total_time)
         
         return {
             "success": True,
             "data": {
                 "logos": logos,
-                "generation_stats": stats.dict()
+                "generation_stats": stats.model_dump()
             }
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Unexpected error: {str(e)}")
+        logger.error("❌ Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+# Download format -> file extension
+_EXT_MAP = {"png": "png", "webp": "webp", "jpg": "jpg", "jpeg": "jpg"}
+
 @app.get("/api/v1/logo/{logo_id}/download/{format}")
-async def download_logo(logo_id: str, format: str):
+async def download_logo(logo_id: str, format: str, http_request: Request):
     """Download logo in specified format"""
     try:
-        if format not in ['png', 'jpg', 'jpeg']:
-            raise HTTPException(status_code=400, detail="Format must be png, jpg, or jpeg")
+        file_extension = _EXT_MAP.get(format)
+        if file_extension is None:
+            raise HTTPException(status_code=400, detail="Format must be png, webp, jpg, or jpeg")
         
-        file_extension = 'jpg' if format in ['jpg', 'jpeg'] else 'png'
-        
-        # Find the file
-        possible_paths = [
-            f"generated_logos/{logo_id}.{file_extension}",
-            f"generated_logos/{logo_id}_v1.{file_extension}",
-            f"generated_logos/{logo_id}_v2.{file_extension}"
-        ]
-        
-        # Also try with base ID patterns
-        if '_' in logo_id:
-            base_parts = logo_id.split('_')
-            base_id = base_parts[0]
-            possible_paths.extend([
-                f"generated_logos/{base_id}_v1.{file_extension}",
-                f"generated_logos/{base_id}_v2.{file_extension}"
-            ])
-        
-        file_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                file_path = path
-                logger.info(f"✅ Found file: {file_path}")
-                break
+        # Same content-hash ETag as /static/logos, so repeat downloads revalidate with a 304;
+        # the stat and hash run in the thread pool and double as the existence check
+        file_path = logo_file_path(logo_id, file_extension)
+        meta = await logo_file_meta(file_path)
+        if meta is None and file_extension == "webp":
+            # Derived from this logo's own PNG on first request, then served like any other logo file
+            png_path = logo_file_path(logo_id, "png")
+            if await logo_file_meta(png_path) is not None:
+                file_path = await asyncio.to_thread(_write_webp_variant, png_path)
+                meta = await logo_file_meta(file_path)
         
-        if not file_path:
-            logger.error(f"❌ Logo file not found. Tried paths: {possible_paths}")
+        if meta is None:
+            logger.error("❌ Logo file not found: %s.%s", logo_id, file_extension)
             raise HTTPException(
                 status_code=404, 
                 detail=f"Logo file not found. The file may have been deleted or the logo ID is incorrect."
             )
         
+        etag, stat_result = meta
+        headers = {"Cache-Control": LOGO_CACHE_CONTROL, "ETag": etag}
+        if http_request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        
+        # Passing the memoized stat saves FileResponse its own stat in a worker thread
         return FileResponse(
             path=file_path,
             filename=f"{logo_id}.{file_extension}",
-            media_type=f"image/{file_extension}"
+            media_type=f"image/{file_extension}",
+            headers=headers,
+            stat_result=stat_result
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Download error: {str(e)}")
+        logger.error("❌ Download error: %s", e)
         raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
 
 @app.post("/api/v1/feedback")
@@ -922,48 +1864,59 @@ async def submit_feedback(feedback_data: dict):
         if not isinstance(rating, int) or rating < 1 or rating > 5:
             raise HTTPException(status_code=400, detail="rating must be an integer between 1 and 5")
         
-        logger.info(f"📝 Enhanced Vertex AI feedback for {logo_id}: Rating {rating}/5")
+        logger.info("📝 Enhanced Vertex AI feedback for %s: Rating %s/5", logo_id, rating)
         if feedback_text:
-            logger.info(f"💬 Comment: {feedback_text}")
+            logger.info("💬 Comment: %s", feedback_text)
+        
+        feedback = {
+            "logo_id": logo_id,
+            "rating": rating,
+            "feedback_text": feedback_text,
+            "timestamp": _now_iso()
+        }
+        feedback_writer.submit(feedback)
         
         return {
             "success": True,
             "message": "Feedback received successfully",
-            "feedback": {
-                "logo_id": logo_id,
-                "rating": rating,
-                "feedback_text": feedback_text,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+            "feedback": feedback
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Feedback error: {str(e)}")
+        logger.error("❌ Feedback error: %s", e)
         raise HTTPException(status_code=500, detail=f"Feedback submission failed: {str(e)}")
 
+# Health payload, re-serialized at most once per second (monitors poll this endpoint constantly)
+_HEALTH_JSON: Dict[tuple, bytes] = {}
+
 @app.get("/api/v1/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    return {
-        "status": "healthy" if CREDENTIALS and PROJECT_ID else "auth_missing",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": "8.1.0-enhanced",
-        "project_id": PROJECT_ID,
-        "credentials_configured": bool(CREDENTIALS),
-        "vertex_ai_ready": bool(CREDENTIALS and PROJECT_ID),
-        "enhancement_features": {
-            "business_description_integration": True,
-            "target_audience_optimization": True,
-            "enhanced_prompt_generation": True,
-            "contextual_logo_design": True
-        },
-        "directories": {
-            "generated_logos": os.path.exists("generated_logos"),
-            "static": os.path.exists("static")
-        }
-    }
+    state = (int(time.time()), bool(CREDENTIALS), PROJECT_ID)
+    content = _HEALTH_JSON.get(state)
+    if content is None:
+        _HEALTH_JSON.clear()
+        content = _HEALTH_JSON[state] = _json_bytes({
+            "status": "healthy" if CREDENTIALS and PROJECT_ID else "auth_missing",
+            "timestamp": _now_iso(),
+            "version": "8.1.0-enhanced",
+            "project_id": PROJECT_ID,
+            "credentials_configured": bool(CREDENTIALS),
+            "vertex_ai_ready": bool(CREDENTIALS and PROJECT_ID),
+            "enhancement_features": {
+                "business_description_integration": True,
+                "target_audience_optimization": True,
+                "enhanced_prompt_generation": True,
+                "contextual_logo_design": True
+            },
+            "directories": {
+                "generated_logos": os.path.exists("generated_logos"),
+                "static": os.path.exists("static")
+            }
+        })
+    return Response(content, media_type="application/json")
 
 @app.get("/api/v1/test-simple")
 async def test_simple_generation():
@@ -1000,7 +1953,7 @@ async def test_simple_generation():
             }
             
     except Exception as e:
-        logger.error(f"❌ Simple enhanced Vertex AI test failed: {str(e)}")
+        logger.error("❌ Simple enhanced Vertex AI test failed: %s", e)
         return {
             "status": "error",
             "message": f"Simple enhanced Vertex AI test error: {str(e)}"
@@ -1041,156 +1994,166 @@ async def test_enhanced_generation():
         }
         
     except Exception as e:
-        logger.error(f"❌ Enhanced generation test failed: {str(e)}")
+        logger.error("❌ Enhanced generation test failed: %s", e)
         return {
             "status": "error",
             "message": f"Enhanced generation test error: {str(e)}"
         }
 
-@app.get("/api/v1/setup-guide")
-async def vertex_setup_guide():
-    """Comprehensive setup guide for enhanced Vertex AI Imagen"""
-    return {
-        "title": "Enhanced Google Vertex AI Imagen Setup Guide",
-        "version": "2025-enhanced",
-        "new_features": [
-            "✨ Business description integration",
-            "✨ Target audience optimization", 
-            "✨ Enhanced prompt generation",
-            "✨ Contextual logo design",
-            "✨ Multiple meaningful variations"
-        ],
-        "critical_changes": [
-            "✅ Business context now affects logo design",
-            "✅ Target audience influences styling",
-            "✅ Enhanced prompt intelligence",
-            "✅ Improved variation generation"
-        ],
-        "steps": [
-            {
-                "step": 1,
-                "title": "Install Google Cloud SDK",
-                "description": "Download and install the Google Cloud SDK",
-                "details": [
-                    "Visit https://cloud.google.com/sdk/docs/install",
-                    "Download the appropriate installer for your OS",
-                    "Run the installer and follow instructions",
-                    "Restart your terminal/command prompt"
-                ]
-            },
-            {
-                "step": 2,
-                "title": "Authenticate with Google Cloud",
-                "description": "Set up authentication (choose ONE method)",
-                "methods": [
-                    {
-                        "name": "Method A: Application Default Credentials (Recommended)",
-                        "commands": [
-                            "gcloud auth application-default login",
-                            "gcloud config set project YOUR_PROJECT_ID"
-                        ]
-                    },
-                    {
-                        "name": "Method B: Service Account (Production)",
-                        "steps": [
-                            "Create service account in Google Cloud Console",
-                            "Download JSON key file",
-                            "Set GOOGLE_APPLICATION_CREDENTIALS=/path/to/key.json",
-                            "Set GOOGLE_CLOUD_PROJECT=your-project-id"
-                        ]
-                    }
-                ]
-            },
-            {
-                "step": 3,
-                "title": "Enable Required APIs",
-                "description": "Enable Vertex AI API in Google Cloud Console",
-                "details": [
-                    "Go to https://console.cloud.google.com/",
-                    "Navigate to 'APIs & Services' > 'Library'",
-                    "Search for 'Vertex AI API'",
-                    "Click 'Enable'"
-                ]
-            },
-            {
-                "step": 4,
-                "title": "Enable Billing (CRITICAL)",
-                "description": "Vertex AI requires billing to be enabled",
-                "details": [
-                    "Go to 'Billing' in Google Cloud Console",
-                    "Link a payment method to your project",
-                    "Ensure billing is enabled for your project"
-                ]
-            },
-            {
-                "step": 5,
-                "title": "Update Environment Variables",
-                "description": "Set required environment variables in .env file",
-                "variables": [
-                    "GOOGLE_CLOUD_PROJECT=your-project-id",
-                    "GOOGLE_APPLICATION_CREDENTIALS=/path/to/service-account.json (if using service account)"
-                ]
-            },
-            {
-                "step": 6,
-                "title": "Test Enhanced Features",
-                "description": "Use diagnostic endpoints to verify enhanced setup",
-                "endpoints": [
-                    "/api/v1/diagnostics - Full system diagnostics",
-                    "/api/v1/test-simple - Simple generation test",
-                    "/api/v1/test-enhanced - Enhanced features test",
-                    "/api/v1/health - Health check with enhancement status"
-                ]
-            }
-        ],
-        "enhanced_usage_tips": [
-            {
-                "tip": "Detailed Business Description",
-                "description": "Provide a detailed business description to get more relevant logo designs",
-                "example": "Instead of 'Tech company', use 'A software development company that creates mobile apps for healthcare professionals'"
-            },
-            {
-                "tip": "Specific Target Audience",
-                "description": "Define your target audience for better design adaptation", 
-                "example": "young professionals, families with children, luxury market, etc."
-            },
-            {
-                "tip": "Industry Selection",
-                "description": "Choose the most specific industry category for better context",
-                "benefit": "Industry influences design elements and styling"
-            }
-        ],
-        "common_issues_fixed": [
-            {
-                "issue": "Generic logo designs",
-                "old_problem": "Logos didn't reflect business specifics",
-                "new_solution": "Enhanced prompts use business description and context"
-            },
-            {
-                "issue": "Single variation only",
-                "old_problem": "Only one logo generated despite variations=2",
-                "new_solution": "Fixed prompt generation for multiple meaningful variations"
-            },
-            {
-                "issue": "Ignored business details",
-                "old_problem": "Description and target audience had no effect",
-                "new_solution": "Business context now directly influences design"
-            }
-        ],
-        "quick_test_commands": [
-            "gcloud auth list  # Check if authenticated",
-            "gcloud projects list  # Check available projects", 
-            "gcloud config get-value project  # Check current project",
-            "curl -H \"Authorization: Bearer $(gcloud auth print-access-token)\" https://us-central1-aiplatform.googleapis.com/v1/projects/$(gcloud config get-value project)/locations/us-central1/models"
-        ],
-        "troubleshooting": {
-            "auth_issues": "Run 'gcloud auth application-default login'",
-            "project_issues": "Set project with 'gcloud config set project PROJECT_ID'",
-            "api_issues": "Enable Vertex AI API in Cloud Console",
-            "billing_issues": "Enable billing in Cloud Console > Billing",
-            "enhancement_issues": "Check /api/v1/test-enhanced endpoint for feature testing"
+# The setup guide is static, so it is serialized once at import instead of on every request
+_SETUP_GUIDE_JSON = _json_bytes({
+    "title": "Enhanced Google Vertex AI Imagen Setup Guide",
+    "version": "2025-enhanced",
+    "new_features": [
+        "✨ Business description integration",
+        "✨ Target audience optimization", 
+        "✨ Enhanced prompt generation",
+        "✨ Contextual logo design",
+        "✨ Multiple meaningful variations"
+    ],
+    "critical_changes": [
+        "✅ Business context now affects logo design",
+        "✅ Target audience influences styling",
+        "✅ Enhanced prompt intelligence",
+        "✅ Improved variation generation"
+    ],
+    "steps": [
+        {
+            "step": 1,
+            "title": "Install Google Cloud SDK",
+            "description": "Download and install the Google Cloud SDK",
+            "details": [
+                "Visit https://cloud.google.com/sdk/docs/install",
+                "Download the appropriate installer for your OS",
+                "Run the installer and follow instructions",
+                "Restart your terminal/command prompt"
+            ]
+        },
+        {
+            "step": 2,
+            "title": "Authenticate with Google Cloud",
+            "description": "Set up authentication (choose ONE method)",
+            "methods": [
+                {
+                    "name": "Method A: Application Default Credentials (Recommended)",
+                    "commands": [
+                        "gcloud auth application-default login",
+                        "gcloud config set project YOUR_PROJECT_ID"
+                    ]
+                },
+                {
+                    "name": "Method B: Service Account (Production)",
+                    "steps": [
+                        "Create service account in Google Cloud Console",
+                        "Download JSON key file",
+                        "Set GOOGLE_APPLICATION_CREDENTIALS=/path/to/key.json",
+                        "Set GOOGLE_CLOUD_PROJECT=your-project-id"
+                    ]
+                }
+            ]
+        },
+        {
+            "step": 3,
+            "title": "Enable Required APIs",
+            "description": "Enable Vertex AI API in Google Cloud Console",
+            "details": [
+                "Go to https://console.cloud.google.com/",
+                "Navigate to 'APIs & Services' > 'Library'",
+                "Search for 'Vertex AI API'",
+                "Click 'Enable'"
+            ]
+        },
+        {
+            "step": 4,
+            "title": "Enable Billing (CRITICAL)",
+            "description": "Vertex AI requires billing to be enabled",
+            "details": [
+                "Go to 'Billing' in Google Cloud Console",
+                "Link a payment method to your project",
+                "Ensure billing is enabled for your project"
+            ]
+        },
+        {
+            "step": 5,
+            "title": "Update Environment Variables",
+            "description": "Set required environment variables in .env file",
+            "variables": [
+                "GOOGLE_CLOUD_PROJECT=your-project-id",
+                "GOOGLE_APPLICATION_CREDENTIALS=/path/to/service-account.json (if using service account)"
+            ]
+        },
+        {
+            "step": 6,
+            "title": "Test Enhanced Features",
+            "description": "Use diagnostic endpoints to verify enhanced setup",
+            "endpoints": [
+                "/api/v1/diagnostics - Full system diagnostics",
+                "/api/v1/test-simple - Simple generation test",
+                "/api/v1/test-enhanced - Enhanced features test",
+                "/api/v1/health - Health check with enhancement status"
+            ]
         }
+    ],
+    "enhanced_usage_tips": [
+        {
+            "tip": "Detailed Business Description",
+            "description": "Provide a detailed business description to get more relevant logo designs",
+            "example": "Instead of 'Tech company', use 'A software development company that creates mobile apps for healthcare professionals'"
+        },
+        {
+            "tip": "Specific Target Audience",
+            "description": "Define your target audience for better design adaptation", 
+            "example": "young professionals, families with children, luxury market, etc."
+        },
+        {
+            "tip": "Industry Selection",
+            "description": "Choose the most specific industry category for better context",
+            "benefit": "Industry influences design elements and styling"
+        }
+    ],
+    "common_issues_fixed": [
+        {
+            "issue": "Generic logo designs",
+            "old_problem": "Logos didn't reflect business specifics",
+            "new_solution": "Enhanced prompts use business description and context"
+        },
+        {
+            "issue": "Single variation only",
+            "old_problem": "Only one logo generated despite variations=2",
+            "new_solution": "Fixed prompt generation for multiple meaningful variations"
+        },
+        {
+            "issue": "Ignored business details",
+            "old_problem": "Description and target audience had no effect",
+            "new_solution": "Business context now directly influences design"
+        }
+    ],
+    "quick_test_commands": [
+        "gcloud auth list  # Check if authenticated",
+        "gcloud projects list  # Check available projects", 
+        "gcloud config get-value project  # Check current project",
+        "curl -H \"Authorization: Bearer $(gcloud auth print-access-token)\" https://us-central1-aiplatform.googleapis.com/v1/projects/$(gcloud config get-value project)/locations/us-central1/models"
+    ],
+    "troubleshooting": {
+        "auth_issues": "Run 'gcloud auth application-default login'",
+        "project_issues": "Set project with 'gcloud config set project PROJECT_ID'",
+        "api_issues": "Enable Vertex AI API in Cloud Console",
+        "billing_issues": "Enable billing in Cloud Console > Billing",
+        "enhancement_issues": "Check /api/v1/test-enhanced endpoint for feature testing"
     }
+})
+
+# Compressed once at maximum level; served as-is so the gzip middleware leaves it alone
+_SETUP_GUIDE_GZIP = gzip.compress(_SETUP_GUIDE_JSON, compresslevel=9)
+
+@app.get("/api/v1/setup-guide")
+async def vertex_setup_guide(http_request: Request):
+    """Comprehensive setup guide for enhanced Vertex AI Imagen"""
+    headers = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+    if "gzip" in http_request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(_SETUP_GUIDE_GZIP, media_type="application/json", headers=headers)
+    return Response(_SETUP_GUIDE_JSON, media_type="application/json", headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1229,4 +2192,16 @@ if __name__ == "__main__":
         print("   3. Restart this server")
         print("📚 Full guide: http://localhost:8000/api/v1/setup-guide")
     
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Auto-reload is for development only (it adds a file watcher process); set UVICORN_RELOAD=0
+    # to run WEB_CONCURRENCY workers instead. uvloop/httptools ship with uvicorn[standard];
+    # uvloop has no Windows build.
+    reload = os.getenv("UVICORN_RELOAD", "1") == "1"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=None if reload else int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="asyncio" if os.name == "nt" else "uvloop",
+        http="httptools"
+    )
\ No newline at end of file
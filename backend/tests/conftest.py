@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# main.py creates generated_logos/, static/ and DATA_DIR relative to the working directory at
+# import time, so run the suite from a scratch directory instead of the checkout
+_WORKDIR = tempfile.mkdtemp(prefix="logo-generator-tests-")
+os.environ.setdefault("DATA_DIR", os.path.join(_WORKDIR, "data"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(_WORKDIR)
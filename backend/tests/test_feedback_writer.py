@@ -0,0 +1,31 @@
+import orjson
+import pytest
+
+from main import FeedbackWriter
+
+
+@pytest.mark.asyncio
+async def test_feedback_writer_survives_a_batch_that_fails_to_write(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    writer = FeedbackWriter(str(path), max_wait=0.01)
+
+    # orjson raises TypeError on the object(); only that batch may be lost
+    writer.submit({"logo_id": "bad", "rating": object()})
+    await writer.stop()
+    writer.submit({"logo_id": "good", "rating": 5})
+    await writer.stop()
+
+    records = [orjson.loads(line) for line in path.read_bytes().splitlines()]
+    assert records == [{"logo_id": "good", "rating": 5}]
+
+
+@pytest.mark.asyncio
+async def test_feedback_writer_keeps_running_after_a_failed_batch(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    writer = FeedbackWriter(str(path), max_batch=1, max_wait=0.01)
+
+    writer.submit({"logo_id": "bad", "rating": object()})
+    writer.submit({"logo_id": "good", "rating": 4})
+    await writer.stop()
+
+    assert orjson.loads(path.read_bytes()) == {"logo_id": "good", "rating": 4}
@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from main import ImagenBatcher, VertexImagenLogoGenerator
+
+
+class FakeVertex:
+    """Mock Vertex AI predict endpoint; records the instance prompts of every request"""
+
+    def __init__(self):
+        self.requests = []
+        self.respond = image_predictions
+
+    def __call__(self, request):
+        prompts = [instance["prompt"] for instance in json.loads(request.content)["instances"]]
+        self.requests.append(prompts)
+        return self.respond(prompts)
+
+
+def image_predictions(prompts):
+    return httpx.Response(200, json={"predictions": [{"bytesBase64Encoded": f"b64:{p}"} for p in prompts]})
+
+
+@pytest.fixture
+def vertex(monkeypatch):
+    async def access_token():
+        return "test-token"
+
+    fake = FakeVertex()
+    monkeypatch.setattr(main, "CREDENTIALS", object())
+    monkeypatch.setattr(main, "PROJECT_ID", "test-project")
+    monkeypatch.setattr(VertexImagenLogoGenerator, "get_access_token", access_token)
+    monkeypatch.setattr(VertexImagenLogoGenerator, "SINGLE_INSTANCE_MODELS", set())
+    main.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    yield fake
+    del main.app.state.http
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_concurrent_prompts_into_one_request(monkeypatch):
+    calls = []
+
+    async def fake_batch(prompts, model, location):
+        calls.append((list(prompts), model))
+        return [{"success": True, "original_prompt": prompt} for prompt in prompts]
+
+    monkeypatch.setattr(VertexImagenLogoGenerator, "generate_vertex_imagen_batch", fake_batch)
+    batcher = ImagenBatcher(max_batch=4, max_wait=0.05)
+    try:
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), batcher.submit("a"), batcher.submit("c")
+        )
+    finally:
+        await batcher.stop()
+
+    # The duplicate "a" joins the in-flight prompt instead of being sent again
+    assert calls == [(["a", "b", "c"], "imagegeneration@006")]
+    assert [result["original_prompt"] for result in results] == ["a", "b", "a", "c"]
+    assert results[0] is results[2]
+
+
+@pytest.mark.asyncio
+async def test_batcher_groups_by_model_and_skips_single_instance_models(monkeypatch):
+    calls = []
+
+    async def fake_batch(prompts, model, location):
+        calls.append((list(prompts), model))
+        return [{"success": True, "original_prompt": prompt} for prompt in prompts]
+
+    monkeypatch.setattr(VertexImagenLogoGenerator, "generate_vertex_imagen_batch", fake_batch)
+    monkeypatch.setattr(VertexImagenLogoGenerator, "SINGLE_INSTANCE_MODELS", {"imagegeneration@005"})
+    batcher = ImagenBatcher(max_batch=4, max_wait=0.05)
+    try:
+        await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"),
+            batcher.submit("x", "imagegeneration@005"), batcher.submit("y", "imagegeneration@005")
+        )
+    finally:
+        await batcher.stop()
+
+    assert (["a", "b"], "imagegeneration@006") in calls
+    assert sorted(prompts for prompts, model in calls if model == "imagegeneration@005") == [["x"], ["y"]]
+
+
+def test_map_predictions_by_position():
+    images, filtered = VertexImagenLogoGenerator._map_predictions(
+        ["a", "b", "c"],
+        [{"bytesBase64Encoded": "A"}, {"raiFilteredReason": "unsafe"}, {"bytesBase64Encoded": "C"}]
+    )
+    assert [[image["image_b64"] for image in slot] for slot in images] == [["A"], [], ["C"]]
+    assert filtered == [None, "unsafe", None]
+
+
+def test_map_predictions_unaligned_uses_echoed_prompts():
+    images, filtered = VertexImagenLogoGenerator._map_predictions(
+        ["a", "b", "c"],
+        [{"bytesBase64Encoded": "C", "prompt": "c"}, {"bytesBase64Encoded": "?"}]
+    )
+    assert [[image["image_b64"] for image in slot] for slot in images] == [[], [], ["C"]]
+    assert filtered == [None, None, None]
+
+
+@pytest.mark.asyncio
+async def test_batch_maps_predictions_back_to_prompts(vertex):
+    results = await VertexImagenLogoGenerator.generate_vertex_imagen_batch(["a", "b"])
+    assert vertex.requests == [["a", "b"]]
+    assert [(r["original_prompt"], r["images"][0]["image_b64"]) for r in results] == [("a", "b64:a"), ("b", "b64:b")]
+
+
+@pytest.mark.asyncio
+async def test_batch_retries_only_unmatched_prompts(vertex):
+    def handler(prompts):
+        if len(prompts) > 1:
+            # "b" is missing from the response; the other two can be placed by their echoed prompt
+            return httpx.Response(200, json={"predictions": [
+                {"bytesBase64Encoded": "b64:a", "prompt": "a"}, {"bytesBase64Encoded": "b64:c", "prompt": "c"}
+            ]})
+        return image_predictions(prompts)
+
+    vertex.respond = handler
+    results = await VertexImagenLogoGenerator.generate_vertex_imagen_batch(["a", "b", "c"])
+    assert vertex.requests == [["a", "b", "c"], ["b"]]
+    assert [r["images"][0]["image_b64"] for r in results] == ["b64:a", "b64:b", "b64:c"]
+
+
+@pytest.mark.asyncio
+async def test_batch_remembers_models_that_reject_multiple_instances(vertex):
+    def handler(prompts):
+        if len(prompts) > 1:
+            return httpx.Response(400, json={"error": {"message": "only one instance allowed"}})
+        return image_predictions(prompts)
+
+    vertex.respond = handler
+    first = await VertexImagenLogoGenerator.generate_vertex_imagen_batch(["a", "b"])
+    second = await VertexImagenLogoGenerator.generate_vertex_imagen_batch(["c", "d"])
+
+    assert all(result["success"] for result in first + second)
+    assert "imagegeneration@006" in VertexImagenLogoGenerator.SINGLE_INSTANCE_MODELS
+    # One rejected batch, then every prompt goes out on its own without another batch attempt
+    assert vertex.requests[0] == ["a", "b"]
+    assert sorted(vertex.requests[1:3]) == [["a"], ["b"]]
+    assert sorted(vertex.requests[3:]) == [["c"], ["d"]]
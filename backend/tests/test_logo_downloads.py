@@ -0,0 +1,99 @@
+from io import BytesIO
+
+import httpx
+import pytest
+import pytest_asyncio
+from PIL import Image
+
+import main
+
+
+def write_logo(logo_id, color):
+    path = main.logo_file_path(logo_id, "png")
+    Image.new("RGB", (4, 4), color).save(path, "PNG")
+    return path
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_download_resolves_the_exact_logo_id(client):
+    write_logo("d0wn10ad0001_1_1", (255, 0, 0))
+    write_logo("d0wn10ad0001_2_1", (0, 0, 255))
+
+    first = await client.get("/api/v1/logo/d0wn10ad0001_1_1/download/png")
+    second = await client.get("/api/v1/logo/d0wn10ad0001_2_1/download/png")
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == open(main.logo_file_path("d0wn10ad0001_1_1", "png"), "rb").read()
+    assert second.content == open(main.logo_file_path("d0wn10ad0001_2_1", "png"), "rb").read()
+
+
+@pytest.mark.asyncio
+async def test_download_miss_is_a_404_not_a_sibling_variation(client):
+    write_logo("d0wn10ad0002_1_1", (255, 0, 0))
+
+    for logo_id in ("d0wn10ad0002_2_1", "d0wn10ad0002"):
+        response = await client.get(f"/api/v1/logo/{logo_id}/download/png")
+        assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_webp_downloads_of_two_variations_are_their_own_images(client):
+    write_logo("d0wn10ad0003_1_1", (255, 0, 0))
+    write_logo("d0wn10ad0003_2_1", (0, 0, 255))
+
+    # The first download writes d0wn10ad0003_1_1.webp; the second must not pick it up
+    pixels = []
+    for logo_id in ("d0wn10ad0003_1_1", "d0wn10ad0003_2_1"):
+        response = await client.get(f"/api/v1/logo/{logo_id}/download/webp")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        with Image.open(BytesIO(response.content)) as im:
+            pixels.append(im.convert("RGB").getpixel((0, 0)))
+
+    red, blue = pixels
+    assert red[0] > 200 and red[2] < 50
+    assert blue[2] > 200 and blue[0] < 50
+
+
+@pytest.mark.asyncio
+async def test_webp_download_without_a_png_is_a_404(client):
+    write_logo("d0wn10ad0004_1_1", (255, 0, 0))
+    await client.get("/api/v1/logo/d0wn10ad0004_1_1/download/webp")
+
+    response = await client.get("/api/v1/logo/d0wn10ad0004_2_1/download/webp")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_static_logos_get_immutable_caching_and_content_etags(client):
+    write_logo("d0wn10ad0005_1_1", (255, 0, 0))
+
+    response = await client.get("/static/logos/d0wn10ad0005_1_1.png")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == main.LOGO_CACHE_CONTROL
+    etag = response.headers["etag"]
+    assert etag.startswith('"sha256-')
+
+    revalidated = await client.get("/static/logos/d0wn10ad0005_1_1.png", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_logo_file_meta_is_lru_bounded(monkeypatch):
+    monkeypatch.setattr(main, "LOGO_FILE_META", main.OrderedDict())
+    monkeypatch.setattr(main, "LOGO_FILE_META_MAX", 2)
+    paths = [write_logo(f"d0wn10ad0006_{i}_1", (i, 0, 0)) for i in range(1, 4)]
+
+    await main.logo_file_meta(paths[0])
+    await main.logo_file_meta(paths[1])
+    await main.logo_file_meta(paths[0])
+    await main.logo_file_meta(paths[2])
+
+    assert list(main.LOGO_FILE_META) == [paths[0], paths[2]]
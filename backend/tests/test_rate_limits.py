@@ -0,0 +1,185 @@
+import os
+import secrets
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+from main import AsyncTokenBucket, RedisSlidingWindowLimiter, SlidingWindowLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive main's monotonic clock by hand (asyncio keeps the real one)"""
+    fake = FakeClock()
+    monkeypatch.setattr(main, "time", SimpleNamespace(monotonic=fake, time=time.time, perf_counter=time.perf_counter))
+    return fake
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = TokenBucket(capacity=2, refill_rate=1)
+    assert bucket.limit() is None
+    assert bucket.limit() is None
+    assert bucket.limit() == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert bucket.limit() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.limit() is None
+
+
+def test_token_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(capacity=2, refill_rate=1)
+    clock.now += 100
+    assert bucket.limit(2) is None
+    assert bucket.limit() == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_async_token_bucket_waits_for_refill():
+    bucket = AsyncTokenBucket(capacity=1, refill_rate=20)
+    start = time.monotonic()
+    await bucket.acquire()
+    await bucket.acquire()
+    assert time.monotonic() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_async_token_bucket_absorbs_bursts_up_to_capacity():
+    bucket = AsyncTokenBucket(capacity=3, refill_rate=0.001)
+    start = time.monotonic()
+    for _ in range(3):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+
+def test_sliding_window_rejects_until_oldest_hit_expires(clock):
+    limiter = SlidingWindowLimiter(window=60, max_requests=2, max_images=4)
+    assert limiter.hit("client") is None
+    clock.now += 10
+    assert limiter.hit("client") is None
+
+    clock.now += 10
+    assert limiter.hit("client") == pytest.approx(40)
+    # The rejected request wasn't recorded, so the window frees up on schedule
+    clock.now += 40
+    assert limiter.hit("client") is None
+    assert limiter.hit("other-client") is None
+
+
+def test_sliding_window_caps_images(clock):
+    limiter = SlidingWindowLimiter(window=60, max_requests=10, max_images=4)
+    assert limiter.hit("client", 3) is None
+    clock.now += 5
+    assert limiter.hit("client", 2) == pytest.approx(55)
+    assert limiter.hit("client", 1) is None
+    assert limiter.hit("client", 5) == 60
+
+
+@pytest.mark.asyncio
+async def test_enforce_client_rate_limit_sets_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(main, "rate_limits", SlidingWindowLimiter(window=60, max_requests=1, max_images=4))
+    request = Request({"type": "http", "headers": [], "client": ("203.0.113.7", 1234), "app": main.app})
+
+    await main.enforce_client_rate_limit(request, 1)
+    clock.now += 15
+    with pytest.raises(HTTPException) as excinfo:
+        await main.enforce_client_rate_limit(request, 1)
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "46"
+
+
+@pytest.mark.asyncio
+async def test_misconfigured_server_does_not_charge_the_client(monkeypatch):
+    limiter = SlidingWindowLimiter(window=60, max_requests=1, max_images=4)
+    monkeypatch.setattr(main, "rate_limits", limiter)
+    monkeypatch.setattr(main, "CREDENTIALS", None)
+    body = {
+        "business_info": {"name": "Acme", "industry": "Tech"},
+        "style": {"style_type": "modern", "color_palette": ["#112233"]},
+        "variations": 2,
+    }
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        responses = [await client.post("/api/v1/generate-logos", json=body) for _ in range(2)]
+
+    assert [response.status_code for response in responses] == [500, 500]
+    assert not limiter._hits
+
+
+class FakeScriptClient:
+    """Stands in for redis.asyncio.Redis: records script calls and replays canned replies"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls.append((keys, args))
+            return self.replies.pop(0)
+        return run
+
+
+@pytest.mark.asyncio
+async def test_redis_limiter_translates_script_replies():
+    client = FakeScriptClient(-1, 40000)
+    limiter = RedisSlidingWindowLimiter(client, window=60, max_requests=2, max_images=4)
+
+    assert await limiter.hit("ip:203.0.113.7", 2) is None
+    assert await limiter.hit("ip:203.0.113.7", 1) == pytest.approx(40)
+
+    keys, args = client.calls[0]
+    assert keys == ["rl:ip:203.0.113.7"]
+    assert args[:4] == [60000, 2, 4, 2]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_falls_back_to_per_worker_limits(monkeypatch):
+    from redis.exceptions import ConnectionError as RedisConnectionError
+
+    class DownRedis:
+        async def hit(self, client_id, images):
+            raise RedisConnectionError("connection refused")
+
+    monkeypatch.setattr(main.app.state, "redis_rate_limits", DownRedis(), raising=False)
+    monkeypatch.setattr(main, "rate_limits", SlidingWindowLimiter(window=60, max_requests=1, max_images=4))
+    request = Request({"type": "http", "headers": [], "client": ("203.0.113.7", 1234), "app": main.app})
+
+    await main.enforce_client_rate_limit(request, 1)
+    with pytest.raises(HTTPException) as excinfo:
+        await main.enforce_client_rate_limit(request, 1)
+    assert excinfo.value.status_code == 429
+
+
+# Opt-in through its own variable so the suite never writes to the Redis the app is pointed at
+@pytest.mark.skipif(not os.getenv("REDIS_TEST_URL"), reason="needs a Redis server (set REDIS_TEST_URL)")
+@pytest.mark.asyncio
+async def test_redis_limiter_against_redis():
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(os.environ["REDIS_TEST_URL"])
+    prefix = f"rl-test-{secrets.token_hex(4)}:"
+    limiter = RedisSlidingWindowLimiter(client, window=60, max_requests=2, max_images=3, prefix=prefix)
+    try:
+        assert await limiter.hit("client", 1) is None
+        assert await limiter.hit("client", 3) == pytest.approx(60, abs=1)
+        assert await limiter.hit("client", 2) is None
+        assert 58 < await limiter.hit("client", 1) <= 60
+        assert await limiter.hit("other-client", 3) is None
+    finally:
+        await client.delete(prefix + "client", prefix + "other-client")
+        await client.aclose()
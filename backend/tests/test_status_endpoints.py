@@ -0,0 +1,16 @@
+import httpx
+import orjson
+import pytest
+
+import main
+
+
+@pytest.mark.asyncio
+async def test_root_status_is_not_cacheable_by_shared_proxies(monkeypatch):
+    monkeypatch.setattr(main, "CREDENTIALS", None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.get("/")
+
+    assert response.status_code == 200
+    assert "public" not in response.headers["cache-control"]
+    assert orjson.loads(response.content)["status"] == "auth_missing"
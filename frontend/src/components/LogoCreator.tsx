@@ -22,6 +22,7 @@ interface LogoResponse {
   generation_time: number;
   confidence_score: number;
   prompt_used: string;
+  cached?: boolean;
 }
 
 interface GenerationStats {
@@ -31,6 +32,7 @@ interface GenerationStats {
   quality: string;
   approximate_cost: string;
   real_ai_generated: boolean;
+  cache_hits?: number;
 }
 
 interface BusinessInfo {
@@ -334,7 +336,7 @@ const VertexLogoCreator = () => {
     );
   };
 
-  const downloadLogo = async (logo: LogoResponse, format: 'png' | 'jpg') => {
+  const downloadLogo = async (logo: LogoResponse, format: 'png' | 'webp') => {
     try {
       setDownloadingLogo(logo.id + format);
       
@@ -512,7 +514,7 @@ const VertexLogoCreator = () => {
               </p>
               <p className="text-sm text-green-300 mt-1">
                 Generation time: {generationStats.total_time.toFixed(1)}s • 
-                Cost: {generationStats.approximate_cost} • 
+                Cost: {generationStats.approximate_cost}{generationStats.cache_hits ? ` (${generationStats.cache_hits} from cache)` : ''} • 
                 Quality: {generationStats.quality}
               </p>
             </div>
@@ -882,19 +884,19 @@ const VertexLogoCreator = () => {
                               <span className="text-xs">PNG</span>
                             </button>
                             
-                            {/* JPEG Download */}
+                            {/* WebP Download */}
                             <button
                               type="button"
-                              onClick={() => downloadLogo(logo, 'jpg')}
-                              disabled={downloadingLogo === logo.id + 'jpg'}
+                              onClick={() => downloadLogo(logo, 'webp')}
+                              disabled={downloadingLogo === logo.id + 'webp'}
                               className="px-3 py-2 bg-orange-500/20 text-orange-400 border border-orange-500/30 rounded-lg hover:bg-orange-500/30 transition-colors disabled:opacity-50 flex items-center gap-1"
                             >
-                              {downloadingLogo === logo.id + 'jpg' ? (
+                              {downloadingLogo === logo.id + 'webp' ? (
                                 <RefreshCw className="w-4 h-4 animate-spin" />
                               ) : (
                                 <Image className="w-4 h-4" />
                               )}
-                              <span className="text-xs">JPG</span>
+                              <span className="text-xs">WEBP</span>
                             </button>
                             
                             {/* Feedback Button */}